@@ -2,19 +2,40 @@ import pandas as pd
 import numpy as np
 import random
 import time
-from faker import Faker
+from faker import Faker, VERSION as faker_version
+import asyncio
+import bisect
+import collections.abc
+import cProfile
+import csv
 import json
+import math
+import multiprocessing
+import operator
+import os
+import pstats
+import re
+import shutil
+import statistics
+import threading
+import tracemalloc
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import StringIO
 
 # Connect to ExCompany database on PostgreSQL
+db_params = {
+    "dbname": "ExCompany",
+    "user": "postgres",
+    "password": "<password>",
+    "host": "localhost",
+    "port": 5432,
+}
 
-db_connection = psycopg2.connect(
-    dbname="ExCompany",
-    user="postgres",
-    password="<password>",
-    host="localhost",
-    port=5432,
-)
+db_connection = psycopg2.connect(**db_params)
 
 # Create a cursor object to execute SQL queries
 cursor = db_connection.cursor()
@@ -30,1172 +51,3139 @@ chicago_latitude_bounds = (41.6445, 42.023)
 chicago_longitude_bounds = (-87.9401, -87.524)
 
 
-# Generate random data for each column
-def create_faker_data(num_rows):
-    employee_data = []
-    for _ in range(0, num_rows):
-        employee_id = fake.unique.random_int(
-            min=100000000, max=999999999
-        )  # Random 9-digit employee ID
-        first_name = fake.first_name()
-        last_name = fake.last_name()
-        age = int(
-            np.clip(np.random.normal(loc=35, scale=10), 18, 65)
-        )  # Random age between 18 and 65 drawn from normal distribution with mean = 35, sd = 10
-        rating = max(
-            0, min(5, round(np.random.normal(loc=3, scale=1), 2))
-        )  # Random rating between 0 and 5 drawn from normal distribution with mean = 3, sd = 1
-
-        # Contact info for JSON and BJSON columns
-        email = f"{first_name.lower()}.{last_name.lower()}@company.com"  # Generate email based on name
-        phone_number = f"{company_area_code}-555-{fake.random_int(min = 1000, max = 9999)}"  # Generate phone number with fixed area code and random extension number
-
-        # Create JSON and BJSON contact info
-        json_contact_info = {
-            "phone": phone_number,
-            "email": email,
-        }
-        bjson_contact_info = json.dumps(
-            json_contact_info
-        )  # Serialize BJSON data to string using json.dumps()
+# Number of names drawn from Faker up front for the batch generator to pick from
+name_pool_size = 10000
 
-        # Info for address geometry column (drawn from uniform distribution)
-        latitude = random.uniform(
-            chicago_latitude_bounds[0], chicago_latitude_bounds[1]
-        )
-        longitude = random.uniform(
-            chicago_longitude_bounds[0], chicago_longitude_bounds[1]
-        )
-        address = f"POINT({longitude} {latitude})"  # Random point within Chicago bounds
-
-        employee_data.append(
-            (
-                employee_id,
-                first_name,
-                last_name,
-                age,
-                rating,
-                json.dumps(json_contact_info),
-                json.dumps(bjson_contact_info),
-                address,
+# Bump whenever create_faker_batch changes the data it produces for a given seed
+generator_version = 1
+
+# Lazily built pools of first and last names, shared by every batch
+name_pools = {}
+
+
+def build_name_pools():
+    # Draw the name pools once from a fixed seed so a batch depends only on its own seed
+    if not name_pools:
+        fake.seed_instance(0)
+        first_names = [fake.first_name() for _ in range(0, name_pool_size)]
+        last_names = [fake.last_name() for _ in range(0, name_pool_size)]
+        name_pools["first_name"] = np.array(first_names, dtype=object)
+        name_pools["last_name"] = np.array(last_names, dtype=object)
+        # Email local parts, escaped once for the JSON text and twice for the
+        # BJSON text so both can be pasted together without calling json.dumps
+        for column, names in (("first", first_names), ("last", last_names)):
+            escaped = [json.dumps(name.lower())[1:-1] for name in names]
+            name_pools[f"{column}_email"] = np.array(escaped, dtype=object)
+            name_pools[f"{column}_email_bjson"] = np.array(
+                [json.dumps(name)[1:-1] for name in escaped], dtype=object
             )
-        )
-    return employee_data
+    return name_pools
 
 
-def create_full_query(reps, num_rows, faker_entries):
+# Generate whole columns of random data at once
+def create_faker_batch(num_rows, seed=None):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    num_rows {int}: number of employee entries to generate
+    seed {int}: seed for the random generator, None for fresh entropy
     """
-    # Row by row insertion using python and psycopg2 of the whole dataset
-    full_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_full, row)
-        toc = time.perf_counter()
-        full_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average full table insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(full_query_times)/reps} seconds for a total of
-        {sum(full_query_times)} seconds using Python and psycopg2
-        """
+    rng = np.random.default_rng(seed)
+    pools = build_name_pools()
+
+    employee_id = (
+        rng.choice(900000000, size=num_rows, replace=False) + 100000000
+    )  # Unique 9-digit employee IDs from a partial permutation of the ID range
+    first_index = rng.integers(0, name_pool_size, size=num_rows)
+    last_index = rng.integers(0, name_pool_size, size=num_rows)
+    age = np.clip(rng.normal(loc=35, scale=10, size=num_rows), 18, 65).astype(
+        np.int64
+    )  # Ages between 18 and 65 drawn from normal distribution with mean = 35, sd = 10
+    rating = np.clip(
+        np.round(rng.normal(loc=3, scale=1, size=num_rows), 2), 0, 5
+    )  # Ratings between 0 and 5 drawn from normal distribution with mean = 3, sd = 1
+    extension = rng.integers(1000, 10000, size=num_rows)  # Phone extension numbers
+    latitude = rng.uniform(
+        chicago_latitude_bounds[0], chicago_latitude_bounds[1], size=num_rows
+    )
+    longitude = rng.uniform(
+        chicago_longitude_bounds[0], chicago_longitude_bounds[1], size=num_rows
     )
-    return full_query_times
 
+    # Contact info for JSON and BJSON columns, laid out exactly as json.dumps would
+    extension = extension.tolist()
+    json_contact_info = [
+        f'{{"phone": "{company_area_code}-555-{ext}", "email": "{first}.{last}@company.com"}}'
+        for ext, first, last in zip(
+            extension,
+            pools["first_email"][first_index],
+            pools["last_email"][last_index],
+        )
+    ]
+    # The BJSON column has always held the contact info serialized a second time
+    bjson_contact_info = [
+        f'"{{\\"phone\\": \\"{company_area_code}-555-{ext}\\", \\"email\\": \\"{first}.{last}@company.com\\"}}"'
+        for ext, first, last in zip(
+            extension,
+            pools["first_email_bjson"][first_index],
+            pools["last_email_bjson"][last_index],
+        )
+    ]
+
+    # Random point within Chicago bounds
+    address = [
+        f"POINT({lon} {lat})" for lon, lat in zip(longitude.tolist(), latitude.tolist())
+    ]
+
+    return {
+        "employee_id": employee_id,
+        "first_name": pools["first_name"][first_index],
+        "last_name": pools["last_name"][last_index],
+        "age": age,
+        "rating": rating,
+        "json_contact_info": np.array(json_contact_info, dtype=object),
+        "bjson_contact_info": np.array(bjson_contact_info, dtype=object),
+        "address": np.array(address, dtype=object),
+    }
+
+
+# Order of the columns in every employee row tuple
+employee_columns = (
+    "employee_id",
+    "first_name",
+    "last_name",
+    "age",
+    "rating",
+    "json_contact_info",
+    "bjson_contact_info",
+    "address",
+)
+
+
+def batch_to_rows(batch):
+    # Turn a column batch into row tuples of plain Python values psycopg2 can adapt
+    return list(zip(*(batch[column].tolist() for column in employee_columns)))
+
+
+# Generate random data for each column
+def create_faker_data(num_rows, seed=None):
+    return batch_to_rows(create_faker_batch(num_rows, seed))
+
+
+# Directory holding memory-mapped employee datasets and its size budget on disk
+faker_cache_dir = "faker_cache"
+faker_cache_max_bytes = 4 * 1024**3
+
+# Seed of the dataset every workload samples from
+faker_seed = 460
+
+
+def faker_cache_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
 
-def create_text_query(reps, num_rows, faker_entries):
+
+def evict_faker_cache(keep):
+    # Drop least recently used datasets until the cache fits its size budget
+    entries = [
+        entry.path
+        for entry in os.scandir(faker_cache_dir)
+        if entry.is_dir() and entry.path != keep and not entry.name.startswith("tmp")
+    ]
+    entries.sort(key=os.path.getmtime)
+    total_bytes = faker_cache_size(keep) + sum(map(faker_cache_size, entries))
+    for path in entries:
+        if total_bytes <= faker_cache_max_bytes:
+            break
+        total_bytes -= faker_cache_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+# Map a cached batch of employee data, generating and storing it on first use
+def load_faker_batch(num_rows, seed=faker_seed):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    num_rows {int}: number of employee entries in the dataset
+    seed {int}: seed the dataset was generated from
     """
-    # Row by row insertion using python and psycopg2 of
-    # the text entries first name and last name with Employee ID
-    text_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_text = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name)
-            VALUES (%s, %s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_text, row[0:3])
-        toc = time.perf_counter()
-        text_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average text insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(text_query_times)/reps} seconds for a total of
-        {sum(text_query_times)} seconds using Python and psycopg2
-        """
+    # The name pools come from Faker, so its version and locale are part of the key
+    path = os.path.join(
+        faker_cache_dir,
+        f"v{generator_version}_faker{faker_version}_{'-'.join(fake.locales)}"
+        f"_rows{num_rows}_seed{seed}",
     )
-    return text_query_times
+    if not os.path.isdir(path):
+        os.makedirs(faker_cache_dir, exist_ok=True)
+        batch = create_faker_batch(num_rows, seed)
+        # Write into a private directory and rename it so readers never see half a dataset
+        tmp_path = os.path.join(
+            faker_cache_dir, f"tmp{os.getpid()}_{os.path.basename(path)}"
+        )
+        os.makedirs(tmp_path, exist_ok=True)
+        for column in employee_columns:
+            values = batch[column]
+            if values.dtype == object:
+                values = values.astype(str)  # Fixed-width strings can be memory-mapped
+            np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process stored the same dataset first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        evict_faker_cache(keep=path)
+    os.utime(path)  # Mark as recently used for eviction
+    return {
+        column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+        for column in employee_columns
+    }
 
 
-def create_int_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    # Row by row insertion using python and psycopg2 of
-    # the integer entry age with Employee ID
-    int_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_int = """
-            INSERT INTO employees
-            (employee_id, age)
-            VALUES (%s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_int, (row[0], row[3]))
-        toc = time.perf_counter()
-        int_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average integer insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(int_query_times)/reps} seconds for a total of
-        {sum(int_query_times)} seconds using Python and psycopg2
-        """
+# Rows converted to Python objects at a time when a whole dataset is iterated
+employee_rows_chunk = 10000
+
+
+class EmployeeRows(collections.abc.Sequence):
+    # Row tuples read straight from the memory-mapped columns of a cached dataset, so
+    # sampling a few rows never copies the rest of it into Python objects
+    def __init__(self, batch):
+        self.columns = [batch[column] for column in employee_columns]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(*(values[index].tolist() for values in self.columns)))
+        return tuple(values[index].item() for values in self.columns)
+
+    def __iter__(self):
+        for start in range(0, len(self), employee_rows_chunk):
+            yield from self[start : start + employee_rows_chunk]
+
+
+# Cached employee data as a sequence of row tuples
+def load_faker_data(num_rows, seed=faker_seed):
+    return EmployeeRows(load_faker_batch(num_rows, seed))
+
+
+# EXECUTE statements for the queries prepared on each connection, keyed by query text
+prepared_statements = {}
+
+
+def prepare_statement(statement_cursor, query, num_params):
+    # PREPARE the query on the server once per connection and return its EXECUTE
+    statements = prepared_statements.setdefault(statement_cursor.connection, {})
+    if query not in statements:
+        name = f"workload_statement_{len(statements)}"
+        placeholders = iter(range(1, num_params + 1))
+        server_query = re.sub("%s", lambda _: f"${next(placeholders)}", query)
+        statement_cursor.execute(f"PREPARE {name} AS {server_query}")
+        statements[query] = f"EXECUTE {name} ({', '.join(['%s'] * num_params)})"
+    return statements[query]
+
+
+# Transactions the timed statements run in: one per cell, a commit after every rep
+# or every commit_rows rows, or every statement committing on its own
+transaction_modes = ("cell", "rep", "rows", "autocommit")
+
+# Whether the connections of the cell run in autocommit, the time the rep being
+# timed spent committing and undoing its statements, summed over its connections,
+# and the part of the rep's wall time the undos took, which is left out of its time
+commit_state = {
+    "autocommit": False,
+    "seconds": 0.0,
+    "undo_seconds": 0.0,
+    "undo_wall_seconds": 0.0,
+}
+commit_lock = threading.Lock()
+
+
+def add_commit_time(seconds):
+    with commit_lock:
+        commit_state["seconds"] += seconds
+
+
+# Parts of every rep timed on their own: committing inside the timed region, undoing
+# statements, which is taken off the rep's time, and resetting the table after it
+rep_parts = ("commit", "undo", "reset")
+
+
+def add_undo_time(seconds):
+    with commit_lock:
+        commit_state["undo_seconds"] += seconds
+
+
+def add_undo_wall_time(slices):
+    # How much sooner the slowest of the rep's slices, as (seconds, undo seconds),
+    # would have finished without undoing its statements
+    slowest = max(seconds for seconds, undo_seconds in slices)
+    slowest_without_undo = max(
+        seconds - undo_seconds for seconds, undo_seconds in slices
     )
-    return int_query_times
+    with commit_lock:
+        commit_state["undo_wall_seconds"] += slowest - slowest_without_undo
+
+
+def commit_workload():
+    # Commit the shared connection, timing it into the commits of the rep
+    tic = time.perf_counter()
+    db_connection.commit()
+    add_commit_time(time.perf_counter() - tic)
+
+
+def set_workload_autocommit(enabled):
+    # Autocommit can only be switched between transactions, so end the open one
+    db_connection.commit()
+    db_connection.autocommit = enabled
+    commit_state["autocommit"] = enabled
+
+
+# Thread pools and their connection pools, keyed by number of workers
+worker_pools = {}
+
+# Per-row latency of each worker, one list per rep, since the last report
+worker_latencies = []
 
 
-def create_float_query(reps, num_rows, faker_entries):
+def split_across_workers(task, params_list, workers=1):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    task {function}: called as task(cursor, params_slice) to do the timed work,
+        returning the seconds it spent undoing statements if it undoes them
+    params_list {list}: parameter tuples, split evenly across the workers
+    workers {int}: number of client threads, each with its own pooled connection
     """
-    # Row by row insertion using python and psycopg2 of
-    # the float entry Rating and Employee ID
-    float_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_float = """
-            INSERT INTO employees
-            (employee_id, rating)
-            VALUES (%s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_float, (row[0], row[4]))
-        toc = time.perf_counter()
-        float_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average float insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(float_query_times)/reps} seconds for a total of
-        {sum(float_query_times)} seconds using Python and psycopg2
-        """
+    if workers <= 1:
+        undo_seconds = task(workload_cursor(), params_list) or 0.0
+        add_undo_wall_time([(undo_seconds, undo_seconds)])
+        return
+    if workers not in worker_pools:
+        worker_pools[workers] = (
+            ThreadPoolExecutor(max_workers=workers),
+            psycopg2.pool.ThreadedConnectionPool(workers, workers, **db_params),
+        )
+    executor, connection_pool = worker_pools[workers]
+    # Commit the setup so the pooled connections see it and a TRUNCATE stops blocking
+    # them; run_workload commits before starting the timer, so in a rep this rarely
+    # has anything left to commit and is timed with the rep's commits if it does
+    commit_workload()
+
+    def run_slice(params_slice):
+        if not params_slice:
+            # More workers than rows leaves this one nothing to run
+            return 0.0, 0.0
+        worker_connection = connection_pool.getconn()
+        worker_connection.autocommit = commit_state["autocommit"]
+        try:
+            with worker_connection.cursor(
+                cursor_factory=workload_cursor_factory()
+            ) as worker_cursor:
+                tune_connection(worker_connection, worker_cursor)
+                catch_up_plan_discards(worker_connection, worker_cursor)
+                tic = time.perf_counter()
+                undo_seconds = task(worker_cursor, params_slice) or 0.0
+                toc = time.perf_counter()
+            commit_tic = time.perf_counter()
+            worker_connection.commit()
+            add_commit_time(time.perf_counter() - commit_tic)
+        finally:
+            connection_pool.putconn(worker_connection)
+        return toc - tic, undo_seconds
+
+    params_slices = [params_list[i::workers] for i in range(0, workers)]
+    slices = list(executor.map(run_slice, params_slices))
+    add_undo_wall_time(slices)
+    worker_latencies.append(
+        [
+            (seconds - undo_seconds) / len(params_slice) if params_slice else np.nan
+            for (seconds, undo_seconds), params_slice in zip(slices, params_slices)
+        ]
     )
-    return float_query_times
 
 
-def create_json_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    # Row by row insertion using python and psycopg2 of
-    # the JSON field json_contact_info and Employee ID
-    json_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_json = """
-            INSERT INTO employees
-            (employee_id, json_contact_info)
-            VALUES (%s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_json, (row[0], row[5]))
-        toc = time.perf_counter()
-        json_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average json insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(json_query_times)/reps} seconds for a total of
-        {sum(json_query_times)} seconds using Python and psycopg2
-        """
+def report_concurrency(num_rows, query_times):
+    # Aggregate throughput of the reps and mean per-row latency of each worker, over
+    # the calls that handed it rows
+    latencies = np.array(worker_latencies)
+    worker_latencies.clear()
+    worker_means = np.nanmean(latencies, axis=0)
+    slowest_mean = np.nanmax(latencies, axis=1).mean()
+    print(f"""Aggregate throughput was {num_rows * len(query_times) / sum(query_times)}
+        rows/sec across {latencies.shape[1]} workers, with mean per-row latencies of
+        {", ".join(f"{latency * 1000:.3f}" for latency in worker_means)} ms
+        and a slowest worker mean of {slowest_mean * 1000:.3f} ms
+        """)
+
+
+# Latency histogram of the cell being timed, bucket counts and the exact maximum in
+# nanoseconds; counts is None while statements are not being timed one at a time
+latency_histogram = {"counts": None, "max_ns": 0}
+latency_lock = threading.Lock()
+
+# Log-linear buckets as in HdrHistogram: latencies under 128 ns are counted exactly
+# and every power of two above is split into 64 buckets, within 1.6% up to 39 hours
+latency_sub_buckets = 64
+latency_bucket_count = latency_sub_buckets * 43
+
+# Percentiles reported for every cell timed statement by statement
+latency_percentiles_reported = (50, 90, 99, 99.9)
+
+
+def latency_bucket_indices(latencies_ns):
+    latencies_ns = np.asarray(latencies_ns, dtype=np.int64)
+    bit_lengths = np.frexp(latencies_ns.astype(np.float64))[1]
+    shifts = np.maximum(bit_lengths - 7, 0)
+    indices = np.where(
+        latencies_ns < 2 * latency_sub_buckets,
+        latencies_ns,
+        latency_sub_buckets * shifts + (latencies_ns >> shifts),
     )
-    return json_query_times
+    return np.minimum(indices, latency_bucket_count - 1)
 
 
-def create_bjson_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    # Row by row insertion using python and psycopg2 of
-    # the BJSON field bjson_contact_info and Employee ID
-    bjson_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_bjson = """
-            INSERT INTO employees
-            (employee_id, bjson_contact_info)
-            VALUES (%s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_bjson, (row[0], row[6]))
-        toc = time.perf_counter()
-        bjson_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average bjson insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(bjson_query_times)/reps} seconds for a total of
-        {sum(bjson_query_times)} seconds using Python and psycopg2
-        """
+def latency_bucket_value(index):
+    # Highest latency in nanoseconds that falls into the bucket
+    if index < 2 * latency_sub_buckets:
+        return index
+    shift = index // latency_sub_buckets - 1
+    sub_bucket = index - latency_sub_buckets * shift
+    return ((sub_bucket + 1) << shift) - 1
+
+
+def record_latencies(latencies_ns):
+    # Add the statement latencies of one worker slice to the histogram of the cell
+    indices = latency_bucket_indices(latencies_ns)
+    with latency_lock:
+        np.add.at(latency_histogram["counts"], indices, 1)
+        latency_histogram["max_ns"] = max(
+            latency_histogram["max_ns"], int(max(latencies_ns))
+        )
+
+
+def start_latency_histogram(saved=None):
+    # Start counting statement latencies, carrying on from a saved state if given
+    counts = np.zeros(latency_bucket_count, dtype=np.int64)
+    max_ns = 0
+    if saved is not None:
+        for index, count in saved["counts"].items():
+            counts[int(index)] = count
+        max_ns = saved["max_ns"]
+    latency_histogram["counts"] = counts
+    latency_histogram["max_ns"] = max_ns
+
+
+def latency_histogram_state():
+    # Sparse copy of the histogram that can be written to JSON and restored
+    counts = latency_histogram["counts"]
+    return {
+        "counts": {int(index): int(counts[index]) for index in np.flatnonzero(counts)},
+        "max_ns": latency_histogram["max_ns"],
+    }
+
+
+def stop_latency_histogram():
+    state = latency_histogram_state()
+    latency_histogram["counts"] = None
+    return state
+
+
+def latency_percentiles(state):
+    # Percentiles and maximum in seconds of a saved histogram, None if it is empty
+    indices = np.array(sorted(int(index) for index in state["counts"]))
+    if len(indices) == 0:
+        return None
+    counts = np.array([state["counts"][index] for index in indices.tolist()])
+    cumulative = np.cumsum(counts)
+    percentiles = {"statements": int(cumulative[-1])}
+    for percentile in latency_percentiles_reported:
+        rank = max(int(np.ceil(percentile / 100 * cumulative[-1])), 1)
+        index = indices[np.searchsorted(cumulative, rank)]
+        value_ns = min(latency_bucket_value(int(index)), state["max_ns"])
+        percentiles[f"p{percentile:g}"] = value_ns / 1e9
+    percentiles["max"] = state["max_ns"] / 1e9
+    return percentiles
+
+
+def report_latency(percentiles):
+    summary = ", ".join(
+        f"{name} {value * 1000:.3f}"
+        for name, value in percentiles.items()
+        if name != "statements"
     )
-    return bjson_query_times
+    print(f"""Statement latencies of those {percentiles["statements"]} statements were
+        {summary} ms
+        """)
 
 
-def create_geometry_query(reps, num_rows, faker_entries):
+def percentile_ci(ordered_times, percentile=0.5, confidence=0.95):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    ordered_times {list}: rep times so far, sorted
+    percentile {float}: fraction of the reps at or below the estimated time
+    confidence {float}: coverage of the interval around it
     """
-    # Row by row insertion using python and psycopg2 of
-    # the BJSON field bjson_contact_info and Employee ID
-    geometry_query_times = []
-    for i in range(0, reps):
-        employee_data = create_faker_data(faker_entries)
-        insert_query_geometry = """
-            INSERT INTO employees
-            (employee_id, address)
-            VALUES (%s, %s)
-            """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(insert_query_geometry, (row[0], row[7]))
-        toc = time.perf_counter()
-        geometry_query_times.append(toc - tic)
-        cursor.execute("TRUNCATE TABLE employees")
-    print(
-        f"""Average geometry insertion of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(geometry_query_times)/reps} seconds for a total of
-        {sum(geometry_query_times)} seconds using Python and psycopg2
-        """
+    # Distribution-free interval between the order statistics the binomial count of
+    # reps below the percentile falls between, cheap enough to redo after every rep;
+    # low and high are None while too few reps bound it on that side
+    count = len(ordered_times)
+    spread = statistics.NormalDist().inv_cdf((1 + confidence) / 2) * math.sqrt(
+        count * percentile * (1 - percentile)
     )
-    return geometry_query_times
+    low_rank = math.floor(count * percentile - spread)
+    high_rank = math.ceil(count * percentile + spread)
+    value = ordered_times[max(math.ceil(count * percentile), 1) - 1]
+    ci = {
+        "percentile": percentile,
+        "confidence": confidence,
+        "low": ordered_times[low_rank - 1] if low_rank >= 1 else None,
+        "value": value,
+        "high": ordered_times[high_rank - 1] if high_rank <= count else None,
+        "relative_width": None,
+    }
+    if ci["low"] is not None and ci["high"] is not None and value > 0:
+        ci["relative_width"] = (ci["high"] - ci["low"]) / value
+    return ci
 
 
-def read_full_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    full_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_full = """
-        SELECT employee_id, first_name, last_name, age,rating,
-            json_contact_info, bjson_contact_info, address
-        FROM employees 
-        WHERE employee_id = %s AND first_name = %s AND last_name = %s
-            AND age = %s AND rating = %s AND json_contact_info::jsonb = %s
-            AND bjson_contact_info::jsonb = %s AND address::geometry = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_full, row)
-        toc = time.perf_counter()
-        full_query_read_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average full query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(full_query_read_times)/reps} seconds for a total of
-        {sum(full_query_read_times)} seconds using Python and psycopg2
+def report_adaptive(adaptive):
+    print(f"""Stopped after {adaptive["reps"]} of at most {adaptive["max_reps"]} reps
+        with the {adaptive["percentile"]} percentile rep time {adaptive["value"]}
+        seconds in a {adaptive["confidence"]} confidence interval
+        {adaptive["relative_width"]} of it wide, from {adaptive["low"]}
+        to {adaptive["high"]} seconds
         """)
-    return full_query_read_times
 
 
-def update_full_query(reps, num_rows, faker_entries):
+# Client time of the statements sent through profiling cursors, summed over the
+# threads of the cell being profiled; totals is None while no cell is profiled
+client_profile_state = {"totals": None, "cursor": None}
+client_profile_lock = threading.Lock()
+
+# Parts the client time of a profiled statement is split into
+client_profile_parts = ("adapt", "round_trip", "fetch")
+
+
+def add_client_time(part, seconds, statements=0):
+    with client_profile_lock:
+        client_profile_state["totals"][part] += seconds
+        client_profile_state["totals"]["statements"] += statements
+
+
+class ProfilingCursor(psycopg2.extensions.cursor):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    Cursor timing separately the adaptation of the parameters into SQL, the round
+    trip that sends the adapted statement and waits for the server, and the fetching
+    and decoding of the result rows
     """
-    full_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_full = """
-        UPDATE employees
-        SET first_name = %s, last_name = %s, age = %s, rating = %s,
-            json_contact_info = %s, bjson_contact_info = %s,
-            address = %s
-        WHERE employee_id = %s AND first_name = %s AND last_name = %s
-            AND age = %s AND rating = %s AND json_contact_info::jsonb = %s
-            AND bjson_contact_info::jsonb = %s and address::geometry = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
+
+    def mogrify(self, query, vars=None):
         tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(update_query_full, initial_samples[j][1:] + sampled_data[j])
-        toc = time.perf_counter()
-        full_query_update_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average full query update time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(full_query_update_times)/reps} seconds for a total of
-        {sum(full_query_update_times)} seconds using Python and psycopg2
-        """)
-    return full_query_update_times
+        sql = super().mogrify(query, vars)
+        add_client_time("adapt", time.perf_counter() - tic)
+        return sql
 
+    def execute(self, query, vars=None):
+        # The statement is adapted up front so the driver sends it without parameters
+        sql = self.mogrify(query, vars)
+        tic = time.perf_counter()
+        result = super().execute(sql)
+        add_client_time("round_trip", time.perf_counter() - tic, statements=1)
+        return result
 
-def delete_full_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    full_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_full = """
-        DELETE FROM employees
-        WHERE employee_id = %s AND first_name = %s AND last_name = %s
-            AND age = %s AND rating = %s AND json_contact_info::jsonb = %s
-            AND bjson_contact_info::jsonb = %s and address::geometry = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
+    def executemany(self, query, vars_list):
+        # What psycopg2 does in C, one execute per parameter tuple
+        for vars in vars_list:
+            self.execute(query, vars)
+
+    def copy_expert(self, sql, file, size=8192):
         tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(delete_query_full, sampled_data[j])
-            db_connection.rollback()
-        toc = time.perf_counter()
-        full_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average full query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(full_query_delete_times)/reps} seconds for a total of
-        {sum(full_query_delete_times)} seconds using Python and psycopg2
-        """)
-    return full_query_delete_times
+        result = super().copy_expert(sql, file, size)
+        add_client_time("round_trip", time.perf_counter() - tic, statements=1)
+        return result
+
+    def fetchone(self):
+        tic = time.perf_counter()
+        row = super().fetchone()
+        add_client_time("fetch", time.perf_counter() - tic)
+        return row
 
+    def fetchmany(self, size=None):
+        tic = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        add_client_time("fetch", time.perf_counter() - tic)
+        return rows
 
-def read_text_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    text_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_text = """
-        SELECT employee_id, address
-        FROM employees
-        WHERE employee_id = %s AND first_name = %s
-            AND last_name = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
+    def fetchall(self):
         tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_text, row[0:3])
-        toc = time.perf_counter()
-        text_query_read_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average text query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(text_query_read_times)/reps} seconds for a total of
-        {sum(text_query_read_times)} seconds using Python and psycopg2
+        rows = super().fetchall()
+        add_client_time("fetch", time.perf_counter() - tic)
+        return rows
+
+    def __iter__(self):
+        # A named cursor's FETCH round trips count as fetching, itersize rows each
+        rows = self.fetchmany(self.itersize)
+        while rows:
+            yield from rows
+            rows = self.fetchmany(self.itersize)
+
+
+def workload_cursor_factory():
+    return ProfilingCursor if client_profile_state["totals"] is not None else None
+
+
+def workload_cursor():
+    # The shared cursor, or a profiling one on the same connection while profiling
+    if client_profile_state["totals"] is None:
+        return cursor
+    if client_profile_state["cursor"] is None:
+        client_profile_state["cursor"] = db_connection.cursor(
+            cursor_factory=ProfilingCursor
+        )
+    return client_profile_state["cursor"]
+
+
+def start_client_profile():
+    client_profile_state["totals"] = dict.fromkeys(
+        ("statements",) + client_profile_parts, 0
+    )
+
+
+def stop_client_profile():
+    totals = client_profile_state["totals"]
+    client_profile_state["totals"] = None
+    return totals
+
+
+def profile_top_functions(profiler, count=5):
+    # Functions the profiled reps spent the most time in, excluding their callees
+    stats = pstats.Stats(profiler).sort_stats("tottime")
+    return [
+        f"{pstats.func_std_string(function)} {stats.stats[function][2]:.4f}s"
+        for function in stats.fcn_list[:count]
+    ]
+
+
+def memory_top_lines(before, after, count=5):
+    # Source lines whose allocations grew the most between two tracemalloc snapshots
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    return [
+        str(statistic)
+        for statistic in after.filter_traces(ignore).compare_to(
+            before.filter_traces(ignore), "lineno"
+        )[:count]
+    ]
+
+
+def report_client_profile(profile):
+    if "other" in profile:
+        print(f"""Client time of those {profile["reps"]} reps was {profile["adapt"]}
+        seconds adapting parameters, {profile["round_trip"]} seconds in round trips
+        and {profile["fetch"]} seconds handling results over {profile["statements"]}
+        profiled statements, leaving {profile["other"]} seconds elsewhere in Python
+        """)
+    if profile["memory_peak"] is not None:
+        print(f"""Traced memory peaked at {profile["memory_peak"] / 1024:.1f} KiB,
+        growing most at {"; ".join(profile["memory_top"][:3])}
+        """)
+    if profile["cprofile_top"]:
+        print(f"""Most time was spent in {"; ".join(profile["cprofile_top"][:3])}
         """)
-    return text_query_read_times
 
 
-def update_text_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    text_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_text = """
-        UPDATE employees
-        SET first_name = %s, last_name = %s
-        WHERE employee_id = %s AND first_name = %s
-            AND last_name = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                update_query_text,
-                (initial_samples[j][1:3] + sampled_data[j][0:3]),
+# Ways of pulling the result rows of a statement back into Python
+fetch_modes = ("none", "fetchone", "fetchall", "named")
+
+
+def timed_execute(statement_cursor, statement):
+    tic = time.perf_counter()
+    statement_cursor.execute(statement)
+    return time.perf_counter() - tic
+
+
+def run_statements(
+    statement_cursor,
+    query,
+    params_list,
+    prepared=False,
+    undo=False,
+    fetch_mode="none",
+    itersize=2000,
+):
+    if prepared:
+        query = prepare_statement(statement_cursor, query, len(params_list[0]))
+    latencies = [] if latency_histogram["counts"] is not None else None
+    undo_seconds = 0.0
+    if undo:
+        # A plain cursor, so a profiling cursor leaves the undo out of its parts too
+        undo_cursor = statement_cursor.connection.cursor()
+        undo_seconds += timed_execute(undo_cursor, "SAVEPOINT workload_undo")
+    for params in params_list:
+        tic = time.perf_counter_ns()
+        if fetch_mode == "named":
+            # DECLARE a server-side cursor and iterate it itersize rows at a time
+            with statement_cursor.connection.cursor(
+                "workload_fetch", cursor_factory=type(statement_cursor)
+            ) as named_cursor:
+                named_cursor.itersize = itersize
+                named_cursor.execute(query, params)
+                for row in named_cursor:
+                    pass
+        else:
+            statement_cursor.execute(query, params)
+            if fetch_mode == "fetchone":
+                statement_cursor.fetchone()
+            elif fetch_mode == "fetchall":
+                statement_cursor.fetchall()
+        if latencies is not None:
+            latencies.append(time.perf_counter_ns() - tic)
+        if undo:
+            undo_seconds += timed_execute(
+                undo_cursor, "ROLLBACK TO SAVEPOINT workload_undo"
             )
-        toc = time.perf_counter()
-        text_query_update_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average text query update time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(text_query_update_times)/reps} seconds for a total of
-        {sum(text_query_update_times)} seconds using Python and psycopg2
-        """)
-    return text_query_update_times
+    if undo:
+        undo_seconds += timed_execute(undo_cursor, "RELEASE SAVEPOINT workload_undo")
+        undo_cursor.close()
+        add_undo_time(undo_seconds)
+    if latencies:
+        record_latencies(latencies)
+    return undo_seconds
+
 
+# Client libraries the workloads can run their timed statements through
+backends = ("psycopg2", "asyncio")
 
-def delete_text_query(reps, num_rows, faker_entries):
+# Event loop and open psycopg AsyncConnections of the asyncio backend
+async_state = {"loop": None, "connections": []}
+
+
+def split_across_async_workers(task, params_list, workers=1):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    task {function}: coroutine function awaited as task(connection, params_slice),
+        returning the seconds it spent undoing statements if it undoes them
+    params_list {list}: parameter tuples, split evenly across the connections
+    workers {int}: number of statements in flight, each on its own AsyncConnection
     """
-    text_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_text = """
-        DELETE FROM employees
-        WHERE employee_id = %s AND first_name = %s
-            AND last_name = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
+    import psycopg  # Only needed for the asyncio backend
+
+    if async_state["loop"] is None:
+        async_state["loop"] = asyncio.new_event_loop()
+    loop = async_state["loop"]
+    connections = async_state["connections"]
+    while len(connections) < workers:
+        connections.append(
+            loop.run_until_complete(psycopg.AsyncConnection.connect(**db_params))
+        )
+    # Commit the setup so the async connections see it and a TRUNCATE stops blocking
+    # them, timed with the rep's commits as in split_across_workers
+    commit_workload()
+
+    async def run_slice(connection, params_slice):
+        if not params_slice:
+            # More workers than rows leaves this one nothing to run
+            return 0.0, 0.0
+        await connection.set_autocommit(commit_state["autocommit"])
+        if tuned_connections.get(connection) != tuning_state["profile"]:
+            for statement in tuning_statements(tuning_state["profile"]):
+                await connection.execute(statement)
+            tuned_connections[connection] = tuning_state["profile"]
+        if discarded_connections.get(connection, 0) != plan_discards["count"]:
+            await connection.execute("DISCARD PLANS")
+            discarded_connections[connection] = plan_discards["count"]
         tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(delete_query_text, sampled_data[j][0:3])
-            db_connection.rollback()
+        undo_seconds = await task(connection, params_slice) or 0.0
         toc = time.perf_counter()
-        text_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average text query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(text_query_delete_times)/reps} seconds for a total of
-        {sum(text_query_delete_times)} seconds using Python and psycopg2
-        """)
-    return text_query_delete_times
+        commit_tic = time.perf_counter()
+        await connection.commit()
+        add_commit_time(time.perf_counter() - commit_tic)
+        return toc - tic, undo_seconds
+
+    params_slices = [params_list[i::workers] for i in range(0, workers)]
+
+    async def run_all():
+        return await asyncio.gather(
+            *(
+                run_slice(connection, params_slice)
+                for connection, params_slice in zip(connections, params_slices)
+            )
+        )
+
+    slices = loop.run_until_complete(run_all())
+    add_undo_wall_time(slices)
+    worker_latencies.append(
+        [
+            (seconds - undo_seconds) / len(params_slice) if params_slice else np.nan
+            for (seconds, undo_seconds), params_slice in zip(slices, params_slices)
+        ]
+    )
 
 
-def read_integer_query(reps, num_rows, faker_entries):
+async def run_async_statements(
+    connection,
+    query,
+    params_list,
+    prepared=False,
+    undo=False,
+    fetch_mode="none",
+    itersize=2000,
+):
+    # psycopg binds the parameters on the server, prepare decides whether it is named
+    latencies = [] if latency_histogram["counts"] is not None else None
+    undo_seconds = 0.0
+    async with connection.cursor() as statement_cursor:
+        if undo:
+            undo_tic = time.perf_counter()
+            await statement_cursor.execute("SAVEPOINT workload_undo")
+            undo_seconds += time.perf_counter() - undo_tic
+        for params in params_list:
+            tic = time.perf_counter_ns()
+            if fetch_mode == "named":
+                async with connection.cursor("workload_fetch") as named_cursor:
+                    named_cursor.itersize = itersize
+                    await named_cursor.execute(query, params)
+                    async for row in named_cursor:
+                        pass
+            else:
+                await statement_cursor.execute(query, params, prepare=prepared)
+                if fetch_mode == "fetchone":
+                    await statement_cursor.fetchone()
+                elif fetch_mode == "fetchall":
+                    await statement_cursor.fetchall()
+            if latencies is not None:
+                latencies.append(time.perf_counter_ns() - tic)
+            if undo:
+                undo_tic = time.perf_counter()
+                await statement_cursor.execute("ROLLBACK TO SAVEPOINT workload_undo")
+                undo_seconds += time.perf_counter() - undo_tic
+        if undo:
+            undo_tic = time.perf_counter()
+            await statement_cursor.execute("RELEASE SAVEPOINT workload_undo")
+            undo_seconds += time.perf_counter() - undo_tic
+            add_undo_time(undo_seconds)
+    if latencies:
+        record_latencies(latencies)
+    return undo_seconds
+
+
+def execute_rows(
+    query,
+    params_list,
+    prepared=False,
+    undo=False,
+    workers=1,
+    backend="psycopg2",
+    fetch_mode="none",
+    itersize=2000,
+):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    query {str}: SQL statement with %s placeholders
+    params_list {list}: tuples of values to run the statement with, one at a time
+    prepared {bool}: run the statement through a server-side prepared statement
+    undo {bool}: roll every statement back to a savepoint to leave the table unchanged
+    workers {int}: number of client threads, or statements in flight on asyncio
+    backend {str}: one of backends
+    fetch_mode {str}: one of fetch_modes, how the result rows are pulled back
+    itersize {int}: rows a named cursor fetches per round trip
     """
-    integer_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_integer = """
-        SELECT employee_id, age
-        FROM employees
-        WHERE employee_id = %s AND age = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_integer, (row[0], row[3]))
-        toc = time.perf_counter()
-        integer_query_read_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average integer query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(integer_query_read_times)/reps} seconds for a total of
-        {sum(integer_query_read_times)} seconds using Python and psycopg2
+    if fetch_mode not in fetch_modes:
+        raise ValueError(f"Unknown fetch mode {fetch_mode!r}")
+    if backend == "asyncio":
+        split_across_async_workers(
+            lambda connection, params_slice: run_async_statements(
+                connection,
+                query,
+                params_slice,
+                prepared,
+                undo,
+                fetch_mode,
+                itersize,
+            ),
+            params_list,
+            workers,
+        )
+    else:
+        split_across_workers(
+            lambda worker_cursor, params_slice: run_statements(
+                worker_cursor,
+                query,
+                params_slice,
+                prepared,
+                undo,
+                fetch_mode,
+                itersize,
+            ),
+            params_list,
+            workers,
+        )
+
+
+def measure_planning_time(query, params_list):
+    # Ask the server how long planning took for each statement of the last rep
+    planning_ms = 0
+    for params in params_list:
+        cursor.execute("EXPLAIN (SUMMARY ON) " + query, params)
+        for (line,) in cursor.fetchall():
+            if line.startswith("Planning Time:"):
+                planning_ms += float(line.split()[2])
+    return planning_ms / 1000
+
+
+def report_planning_time(planning_seconds, statements):
+    print(f"""Server-side planning of those {statements} statements
+        took {planning_seconds} seconds per rep, time a prepared
+        statement avoids along with parsing
         """)
-    return integer_query_read_times
 
 
-def update_integer_query(reps, num_rows, faker_entries):
+# Ways of sending a batch of new rows to the employees table
+insert_strategies = ("row", "executemany", "execute_values", "copy")
+
+# Characters that have to be escaped in COPY text format
+copy_escapes = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def insert_query_for(columns):
+    return f"""
+        INSERT INTO employees ({", ".join(columns)})
+        VALUES ({", ".join(["%s"] * len(columns))})
+        """
+
+
+def insert_rows(
+    columns,
+    rows,
+    strategy="row",
+    page_size=100,
+    prepared=False,
+    workers=1,
+    backend="psycopg2",
+):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    columns {tuple}: employees columns the row values belong to
+    rows {list}: tuples of values to insert
+    strategy {str}: one of insert_strategies
+    page_size {int}: rows per INSERT statement for the execute_values strategy
+    prepared {bool}: run the row and executemany strategies through a prepared statement
+    workers {int}: number of client threads, or connections in use on asyncio
+    backend {str}: one of backends
     """
-    integer_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_integer = """
-        UPDATE employees
-        SET age = %s
-        WHERE employee_id = %s AND age = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                update_query_integer,
-                (initial_samples[j][3],) + (sampled_data[j][0], sampled_data[j][3]),
+    column_list = ", ".join(columns)
+    insert_query = insert_query_for(columns)
+    if strategy not in insert_strategies:
+        raise ValueError(f"Unknown insert strategy {strategy!r}")
+    if backend == "asyncio":
+        if strategy == "execute_values":
+            raise ValueError("execute_values is not available on the asyncio backend")
+
+        async def insert_async_slice(connection, rows_slice):
+            if strategy == "row":
+                await run_async_statements(
+                    connection, insert_query, rows_slice, prepared
+                )
+                return
+            async with connection.cursor() as insert_cursor:
+                if strategy == "executemany":
+                    # psycopg pipelines executemany and prepares it on its own
+                    await insert_cursor.executemany(insert_query, rows_slice)
+                else:
+                    async with insert_cursor.copy(
+                        f"COPY employees ({column_list}) FROM STDIN"
+                    ) as copy:
+                        for row in rows_slice:
+                            await copy.write_row(row)
+
+        split_across_async_workers(insert_async_slice, rows, workers)
+        return
+
+    def insert_slice(insert_cursor, rows_slice):
+        if strategy == "row":
+            run_statements(insert_cursor, insert_query, rows_slice, prepared)
+        elif strategy == "executemany":
+            if prepared:
+                query = prepare_statement(insert_cursor, insert_query, len(columns))
+                insert_cursor.executemany(query, rows_slice)
+            else:
+                insert_cursor.executemany(insert_query, rows_slice)
+        elif strategy == "execute_values":
+            psycopg2.extras.execute_values(
+                insert_cursor,
+                f"INSERT INTO employees ({column_list}) VALUES %s",
+                rows_slice,
+                page_size=page_size,
+            )
+        elif strategy == "copy":
+            # Stream the rows as tab separated COPY text from an in-memory buffer
+            buffer = StringIO()
+            for row in rows_slice:
+                fields = [str(value).translate(copy_escapes) for value in row]
+                buffer.write("\t".join(fields) + "\n")
+            buffer.seek(0)
+            insert_cursor.copy_expert(
+                f"COPY employees ({column_list}) FROM STDIN", buffer
             )
-        toc = time.perf_counter()
-        integer_query_update_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average integer query update time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(integer_query_update_times)/reps} seconds for a total of
-        {sum(integer_query_update_times)} seconds using Python and psycopg2
-        """)
-    return integer_query_update_times
 
+    split_across_workers(insert_slice, rows, workers)
+
+
+# Ways of looking up the sampled rows in the read workloads
+read_modes = ("row", "batched")
+
+# Casts the workloads apply before comparing a column with a parameter
+match_casts = {
+    "json_contact_info": "::jsonb",
+    "bjson_contact_info": "::jsonb",
+    "address": "::geometry",
+}
+
+# Comparisons that replace the cast equality on some columns, by predicate variant,
+# written so the indexes of index_profiles can serve them
+predicate_variants = {
+    "equality": {},
+    "containment": {
+        "json_contact_info": "{column}::jsonb @> {value}::jsonb",
+        "bjson_contact_info": "{column} @> {value}::jsonb",
+    },
+    "st_equals": {"address": "ST_Equals({column}, {value}::geometry)"},
+    "bbox": {"address": "{column} && {value}::geometry"},
+}
+
+# Columns of a data type the reads, updates and deletes match on, by predicate mode;
+# pk_typed looks a row up by employee_id and then compares every typed column
+predicate_modes = {
+    "pk_typed": lambda columns: columns,
+    "pk_only": lambda columns: columns[:1],
+    "typed_only": lambda columns: columns[1:],
+}
+
+# Secondary indexes on the employees table, by index profile
+index_profiles = {
+    "none": (),
+    "btree": (
+        "CREATE INDEX employees_name_idx ON employees (last_name, first_name)",
+        "CREATE INDEX employees_age_idx ON employees (age)",
+        "CREATE INDEX employees_rating_idx ON employees (rating)",
+    ),
+    "gin": (
+        "CREATE INDEX employees_bjson_gin_idx ON employees"
+        " USING gin (bjson_contact_info)",
+    ),
+    "json_expression": (
+        "CREATE INDEX employees_json_idx ON employees ((json_contact_info::jsonb))",
+    ),
+    "gist": (
+        "CREATE INDEX employees_address_gist_idx ON employees USING gist (address)",
+    ),
+}
+index_profiles["all"] = tuple(
+    statement for statements in index_profiles.values() for statement in statements
+)
 
-def delete_integer_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+
+def compare_column(column, value, predicate="equality", alias=""):
+    # SQL comparing a column with a value under one of predicate_variants
+    template = predicate_variants[predicate].get(
+        column, "{column}{cast} = {value}{cast}"
+    )
+    return template.format(
+        column=alias + column, value=value, cast=match_casts.get(column, "")
+    )
+
+
+# Session settings and table storage options applied around a cell, and the
+# operations each profile is meant for in the workload matrix
+tuning_profiles = {
+    "default": {
+        "settings": {},
+        "table": {},
+        "operations": ("create", "read", "update", "delete"),
+    },
+    "unlogged": {
+        "settings": {},
+        "table": {"unlogged": True},
+        "operations": ("create", "update", "delete"),
+    },
+    "async_commit": {
+        "settings": {"synchronous_commit": "off"},
+        "table": {},
+        "operations": ("create", "update"),
+    },
+    "fillfactor70": {
+        "settings": {},
+        "table": {"fillfactor": 70},
+        "operations": ("update",),
+    },
+    "work_mem": {
+        "settings": {"work_mem": "'64MB'"},
+        "table": {},
+        "operations": ("read",),
+    },
+    "no_jit": {"settings": {"jit": "off"}, "table": {}, "operations": ("read",)},
+}
+
+# Profile of the cell being run, and the profile each open connection was last set to
+tuning_state = {"profile": "default"}
+tuned_connections = {}
+
+
+def tuning_statements(tuning_profile):
+    # SET every setting any profile changes, back to its default unless this one does
+    names = sorted(
+        {name for profile in tuning_profiles.values() for name in profile["settings"]}
+    )
+    settings = tuning_profiles[tuning_profile]["settings"]
+    return [f"SET {name} TO {settings.get(name, 'DEFAULT')}" for name in names]
+
+
+def tune_connection(connection, tuning_cursor):
+    # Bring a pooled connection to the settings of the cell, once per profile change
+    if tuned_connections.get(connection) != tuning_state["profile"]:
+        for statement in tuning_statements(tuning_state["profile"]):
+            tuning_cursor.execute(statement)
+        tuned_connections[connection] = tuning_state["profile"]
+
+
+def apply_table_tuning(tuning_profile):
+    table = tuning_profiles[tuning_profile]["table"]
+    persistence = "UNLOGGED" if table.get("unlogged", False) else "LOGGED"
+    cursor.execute(f"ALTER TABLE employees SET {persistence}")
+    if "fillfactor" in table:
+        cursor.execute(
+            f"ALTER TABLE employees SET (fillfactor = {table['fillfactor']})"
+        )
+    else:
+        cursor.execute("ALTER TABLE employees RESET (fillfactor)")
+
+
+def apply_tuning_profile(tuning_profile):
+    # Tune the table and the shared connection, committed so the SETs outlast any
+    # rollback of the cell and the pooled connections see the table as tuned
+    apply_table_tuning(tuning_profile)
+    for statement in tuning_statements(tuning_profile):
+        cursor.execute(statement)
+    db_connection.commit()
+    tuning_state["profile"] = tuning_profile
+    tuned_connections[db_connection] = tuning_profile
+
+
+# Cache states a cell can be timed in: as it comes, the first rep apart from the
+# steady state after it, warmed up by discarded reps, or made cold before every rep
+cache_modes = ("none", "warm", "cold")
+
+# Ways of making the caches cold: dropping the cached plans of every connection,
+# opening every connection afresh, or evicting the table's shared buffers
+cold_methods = ("discard", "reconnect", "evict")
+
+# Whether the optional extensions controlling the buffer cache worked, None untried
+cache_control_state = {"prewarm": None, "evict": None}
+
+# Plan cache discards so far, and how many of them each open connection has seen
+plan_discards = {"count": 0}
+discarded_connections = {}
+
+# The table and its indexes, by relation, for the buffer cache functions
+employees_relations = """
+    SELECT oid FROM pg_class WHERE oid = 'employees'::regclass
+    UNION ALL
+    SELECT indexrelid FROM pg_index WHERE indrelid = 'employees'::regclass
     """
-    integer_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_integer = """
-        DELETE FROM employees
-        WHERE employee_id = %s AND age = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                delete_query_integer, (sampled_data[j][0], sampled_data[j][3])
+
+
+def run_cache_control(kind, statement):
+    # pg_prewarm and pg_buffercache have to be created, so skip them once they fail
+    if cache_control_state[kind] is False:
+        return False
+    cursor.execute("SAVEPOINT cache_control")
+    try:
+        cursor.execute(statement)
+        cache_control_state[kind] = True
+    except psycopg2.Error as error:
+        cursor.execute("ROLLBACK TO SAVEPOINT cache_control")
+        print(f"Skipping {kind}: {str(error).splitlines()[0]}")
+        cache_control_state[kind] = False
+    cursor.execute("RELEASE SAVEPOINT cache_control")
+    return cache_control_state[kind]
+
+
+def prewarm_table():
+    return run_cache_control(
+        "prewarm",
+        f"SELECT pg_prewarm(oid::regclass) FROM ({employees_relations}) AS relations",
+    )
+
+
+def evict_table_buffers():
+    # pg_buffercache_evict writes dirty buffers out before evicting them
+    return run_cache_control(
+        "evict",
+        f"""
+        SELECT pg_buffercache_evict(bufferid)
+        FROM pg_buffercache
+        WHERE reldatabase = (
+                SELECT oid FROM pg_database WHERE datname = current_database()
             )
-            db_connection.rollback()
-        toc = time.perf_counter()
-        integer_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average integer query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(integer_query_delete_times)/reps} seconds for a total of
-        {sum(integer_query_delete_times)} seconds using Python and psycopg2
+            AND relfilenode IN (
+                SELECT pg_relation_filenode(oid)
+                FROM ({employees_relations}) AS relations
+            )
+        """,
+    )
+
+
+def catch_up_plan_discards(connection, statement_cursor):
+    # Drop the cached plans of a pooled connection that missed the latest discard
+    if discarded_connections.get(connection, 0) != plan_discards["count"]:
+        statement_cursor.execute("DISCARD PLANS")
+        discarded_connections[connection] = plan_discards["count"]
+
+
+def discard_plans():
+    # The shared connection now, the pooled ones before they next run a slice
+    plan_discards["count"] += 1
+    catch_up_plan_discards(db_connection, cursor)
+
+
+def reconnect_workload():
+    # Open every connection the workloads use afresh, with cold session caches,
+    # keeping what the last rep left in the table
+    global db_connection, cursor
+    db_connection.commit()
+    db_connection.close()
+    db_connection = psycopg2.connect(**db_params)
+    cursor = db_connection.cursor()
+    for executor, connection_pool in worker_pools.values():
+        executor.shutdown()
+        connection_pool.closeall()
+    worker_pools.clear()
+    for connection in async_state["connections"]:
+        async_state["loop"].run_until_complete(connection.close())
+    async_state["connections"].clear()
+    client_profile_state["cursor"] = None
+    prepared_statements.clear()
+    tuned_connections.clear()
+    discarded_connections.clear()
+    for statement in tuning_statements(tuning_state["profile"]):
+        cursor.execute(statement)
+    db_connection.commit()
+    tuned_connections[db_connection] = tuning_state["profile"]
+
+
+def make_caches_cold(cold_method):
+    if cold_method == "discard":
+        discard_plans()
+    elif cold_method == "reconnect":
+        reconnect_workload()
+    else:
+        evict_table_buffers()
+
+
+def apply_index_profile(index_profile):
+    # Drop every secondary index the profiles know of, then build the chosen ones
+    for statement in index_profiles["all"]:
+        cursor.execute(f"DROP INDEX IF EXISTS {statement.split()[2]}")
+    for statement in index_profiles[index_profile]:
+        cursor.execute(statement)
+
+
+def describe_plan(query, params, batched=False):
+    # Nodes of the plan the server picks for the statement, outermost first; a
+    # batched query is explained with every row of params in its VALUES list
+    if batched:
+        result = psycopg2.extras.execute_values(
+            cursor,
+            "EXPLAIN (FORMAT JSON) " + query,
+            params,
+            page_size=len(params),
+            fetch=True,
+        )[0]
+    else:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        result = cursor.fetchone()
+    nodes = []
+    pending = [result[0][0]["Plan"]]
+    while pending:
+        node = pending.pop(0)
+        if "Index Name" in node:
+            nodes.append(f"{node['Node Type']} using {node['Index Name']}")
+        else:
+            nodes.append(node["Node Type"])
+        pending = node.get("Plans", []) + pending
+    return " > ".join(nodes)
+
+
+# Server-side measurements kept for every statement run under EXPLAIN ANALYZE
+explain_fields = ("execution", "planning", "shared_hit", "shared_read")
+
+
+def explain_analyze(query, params):
+    # Run one statement under EXPLAIN ANALYZE in a savepoint that undoes its changes
+    cursor.execute("SAVEPOINT explain_analyze")
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+    result = cursor.fetchone()[0][0]
+    cursor.execute("ROLLBACK TO SAVEPOINT explain_analyze")
+    cursor.execute("RELEASE SAVEPOINT explain_analyze")
+    return {
+        "execution": result["Execution Time"] / 1000,
+        "planning": result["Planning Time"] / 1000,
+        "shared_hit": result["Plan"].get("Shared Hit Blocks", 0),
+        "shared_read": result["Plan"].get("Shared Read Blocks", 0),
+        "plan": result["Plan"],
+    }
+
+
+def report_explains(explains):
+    means = {
+        key: np.mean([explain[key] for explain in explains]) for key in explain_fields
+    }
+    print(f"""EXPLAIN ANALYZE of {len(explains)} sampled statements averaged
+        {means["execution"] * 1000:.3f} ms executing and
+        {means["planning"] * 1000:.3f} ms planning with {means["shared_hit"]}
+        shared buffer hits and {means["shared_read"]} reads per statement
         """)
-    return integer_query_delete_times
 
 
-def read_float_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    float_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_float = """
-        SELECT employee_id, rating
-        FROM employees
-        WHERE employee_id = %s AND rating = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_float, (row[0], row[4]))
-        toc = time.perf_counter()
-        float_query_read_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average float query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(float_query_read_times)/reps} seconds for a total of
-        {sum(float_query_read_times)} seconds using Python and psycopg2
+# Whether pg_stat_statements can be read on this connection, None until checked
+pg_stat_statements_state = {"available": None}
+
+# Counters of pg_stat_statements summed over the statements of a cell
+server_stat_fields = (
+    "calls",
+    "total_exec_time",
+    "total_plan_time",
+    "shared_blks_hit",
+    "shared_blks_read",
+)
+
+
+def pg_stat_statements_available():
+    # The extension has to be created and preloaded, so try the view once
+    if pg_stat_statements_state["available"] is None:
+        cursor.execute("SAVEPOINT pg_stat_statements_check")
+        try:
+            cursor.execute("SELECT 1 FROM pg_stat_statements LIMIT 1")
+            pg_stat_statements_state["available"] = True
+        except psycopg2.Error as error:
+            cursor.execute("ROLLBACK TO SAVEPOINT pg_stat_statements_check")
+            print(f"Skipping server-side timings: {str(error).splitlines()[0]}")
+            pg_stat_statements_state["available"] = False
+        cursor.execute("RELEASE SAVEPOINT pg_stat_statements_check")
+    return pg_stat_statements_state["available"]
+
+
+# Leading comment of the statements that reset the table with the same verbs as a
+# workload, which pg_stat_statements keeps in the query text
+reset_statement_tag = "/* workload reset */"
+
+
+def snapshot_pg_stat_statements():
+    # Cumulative counters of every statement on the employees table, by query id
+    cursor.execute(f"""
+        SELECT queryid, query, {", ".join(server_stat_fields)}
+        FROM pg_stat_statements
+        WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+            AND query ILIKE '%employees%'
+            AND query NOT ILIKE '%pg_stat_statements%'
         """)
-    return float_query_read_times
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+def diff_pg_stat_statements(before, after):
+    # What the workload's own statements added between two snapshots, leaving out
+    # the resets, EXPLAINs and index builds around them
+    totals = dict.fromkeys(server_stat_fields, 0)
+    for queryid, (query, *counters) in after.items():
+        if query.startswith(reset_statement_tag):
+            continue
+        if query.split(None, 1)[0].upper() not in (
+            "INSERT",
+            "SELECT",
+            "UPDATE",
+            "DELETE",
+            "COPY",
+            "PREPARE",
+        ):
+            continue
+        previous = before.get(queryid, (query,) + (0,) * len(counters))[1:]
+        for field, counter, previous_counter in zip(
+            server_stat_fields, counters, previous
+        ):
+            totals[field] += counter - previous_counter
+    # Milliseconds as reported by the server into seconds like the client timings
+    return {
+        "calls": int(totals["calls"]),
+        "execution": totals["total_exec_time"] / 1000,
+        "planning": totals["total_plan_time"] / 1000,
+        "shared_hit": int(totals["shared_blks_hit"]),
+        "shared_read": int(totals["shared_blks_read"]),
+    }
 
 
-def update_float_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    float_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_float = """
-        UPDATE employees
-        SET rating = %s
-        WHERE employee_id = %s AND rating = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                update_query_float,
-                (initial_samples[j][4],) + (sampled_data[j][0], sampled_data[j][4]),
-            )
-        toc = time.perf_counter()
-        float_query_update_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average float query update time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(float_query_update_times)/reps} seconds for a total of
-        {sum(float_query_update_times)} seconds using Python and psycopg2
+def report_server_time(server, query_times):
+    print(f"""Server side those {server["calls"]} statements spent {server["execution"]}
+        seconds executing and {server["planning"]} seconds planning with
+        {server["shared_hit"]} shared buffer hits and {server["shared_read"]} reads,
+        of the {sum(query_times)} seconds the client measured
         """)
-    return float_query_update_times
 
 
-def delete_float_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    float_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_float = """
-        DELETE FROM employees
-        WHERE employee_id = %s AND rating = %s
+def batched_select_query(select_columns, match_columns, predicate="equality"):
+    # Look up every sampled row in one statement by joining against a VALUES list,
+    # which also carries the sampled ids to check the rows found against
+    match_predicate = " AND ".join(
+        compare_column(column, f"s.{column}", predicate, "e.")
+        for column in match_columns
+    )
+    return f"""
+        SELECT {", ".join(f"e.{column}" for column in select_columns)}
+        FROM employees e
+        JOIN (VALUES %s) AS s (sampled_id, {", ".join(match_columns)})
+            ON {match_predicate}
         """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(delete_query_float, (sampled_data[j][0], sampled_data[j][4]))
-            db_connection.rollback()
-        toc = time.perf_counter()
-        float_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average float query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(float_query_delete_times)/reps} seconds for a total of
-        {sum(float_query_delete_times)} seconds using Python and psycopg2
-        """)
-    return float_query_delete_times
 
 
-def read_json_query(reps, num_rows, faker_entries):
+def read_rows_batched(
+    select_columns,
+    match_columns,
+    rows,
+    chunk_size=100,
+    workers=1,
+    backend="psycopg2",
+    predicate="equality",
+):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+    select_columns {tuple}: employees columns to return, starting with employee_id
+    match_columns {tuple}: employees columns the row values are matched against
+    rows {list}: tuples of the employee_id of a sampled row then the values to look
+        it up by, one per sampled row
+    chunk_size {int}: number of result rows fetched per round trip
+    workers {int}: number of client threads the rows are split across
+    backend {str}: one of backends, only psycopg2 can build the VALUES list
+    predicate {str}: one of predicate_variants, how the columns are compared
     """
-    json_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_json = """
-        SELECT employee_id, json_contact_info
+    if backend == "asyncio":
+        raise ValueError("Batched reads are not available on the asyncio backend")
+    select_query = batched_select_query(select_columns, match_columns, predicate)
+
+    def read_slice(read_cursor, rows_slice):
+        # A named cursor so the results come over the wire chunk_size rows at a time
+        with read_cursor.connection.cursor(
+            "workload_batch", cursor_factory=type(read_cursor)
+        ) as batch_cursor:
+            psycopg2.extras.execute_values(
+                batch_cursor, select_query, rows_slice, page_size=len(rows_slice)
+            )
+            found_ids = set()
+            chunk = batch_cursor.fetchmany(chunk_size)
+            while chunk:
+                found_ids.update(row[0] for row in chunk)
+                chunk = batch_cursor.fetchmany(chunk_size)
+        # Without employee_id in the match other rows with the same values come too,
+        # so check for the sampled ids themselves rather than a count of rows
+        missing = {row[0] for row in rows_slice} - found_ids
+        if missing:
+            raise RuntimeError(
+                f"Batched read missed {len(missing)} of {len(rows_slice)} sampled rows"
+            )
+
+    split_across_workers(read_slice, rows, workers)
+
+
+# Employees columns each data type matches its rows on, and the columns its reads
+# return; updates set every matched column but employee_id
+data_type_specs = {
+    "full": {"columns": employee_columns, "select": employee_columns},
+    "text": {
+        "columns": ("employee_id", "first_name", "last_name"),
+        "select": ("employee_id", "address"),
+    },
+    "integer": {"columns": ("employee_id", "age")},
+    "float": {"columns": ("employee_id", "rating")},
+    "json": {"columns": ("employee_id", "json_contact_info")},
+    "bjson": {"columns": ("employee_id", "bjson_contact_info")},
+    "geometry": {"columns": ("employee_id", "address")},
+}
+
+
+def row_projection(columns):
+    # Function picking the given columns out of a faker row as a tuple
+    indices = [employee_columns.index(column) for column in columns]
+    if len(indices) == 1:
+        return lambda row: (row[indices[0]],)
+    return operator.itemgetter(*indices)
+
+
+def match_predicate(workload):
+    return " AND ".join(
+        compare_column(column, "%s", workload["predicate"])
+        for column in workload["match"]
+    )
+
+
+def select_query_for(workload):
+    if workload["read_mode"] == "batched":
+        return batched_select_query(
+            workload["select"], workload["match"], workload["predicate"]
+        )
+    return f"""
+        SELECT {", ".join(workload["select"])}
         FROM employees
-        WHERE employee_id = %s AND json_contact_info::jsonb = %s
+        WHERE {match_predicate(workload)}
         """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_json, (row[0], row[5]))
-        toc = time.perf_counter()
-        json_query_read_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average json query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(json_query_read_times)/reps} seconds for a total of
-        {sum(json_query_read_times)} seconds using Python and psycopg2
-        """)
-    return json_query_read_times
 
 
-def update_json_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    json_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_json = """
+def update_query_for(workload):
+    return f"""
         UPDATE employees
-        SET json_contact_info = %s
-        WHERE employee_id = %s AND json_contact_info::jsonb = %s
+        SET {", ".join(f"{column} = %s" for column in workload["columns"][1:])}
+        WHERE {match_predicate(workload)}
         """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                update_query_json,
-                (initial_samples[j][5],) + (sampled_data[j][0], sampled_data[j][5]),
-            )
-        toc = time.perf_counter()
-        json_query_update_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average json query update time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(json_query_update_times)/reps} seconds for a total of
-        {sum(json_query_update_times)} seconds using Python and psycopg2
-        """)
-    return json_query_update_times
 
 
-def delete_json_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    json_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_json = """
+def delete_query_for(workload):
+    return f"""
         DELETE FROM employees
-        WHERE employee_id = %s AND json_contact_info::jsonb = %s
+        WHERE {match_predicate(workload)}
         """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(delete_query_json, (sampled_data[j][0], sampled_data[j][5]))
-            db_connection.rollback()
-        toc = time.perf_counter()
-        json_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average json query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(json_query_delete_times)/reps} seconds for a total of
-        {sum(json_query_delete_times)} seconds using Python and psycopg2
-        """)
-    return json_query_delete_times
 
 
-def read_bjson_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
+# First employee_id of the filler rows, past the 9-digit ids of the faker data
+filler_first_id = 1000000000
+
+# Seed of the server's random() while generating filler rows, so every cell of a
+# table size pads its table alike
+filler_seed = 0.46
+
+# Filler ages and ratings are shifted this far past the 18-65 and 0-5 ranges of the
+# faker data, so a typed_only integer or float predicate never matches a filler row
+filler_age_offset = 100
+filler_rating_offset = 10
+
+# Filler rows drawn from the same distributions as create_faker_batch, generated on
+# the server rather than sent over the wire; names and emails are numbered, ages and
+# ratings shifted and addresses drawn at random, so no sampled row's predicate
+# matches a filler row
+filler_insert_query = f"""
+    INSERT INTO employees ({", ".join(employee_columns)})
+    SELECT
+        %s + n,
+        'Filler' || n,
+        'Row' || n,
+        {filler_age_offset} + trunc(least(greatest(35 + 10 * age_z, 18), 65)),
+        {filler_rating_offset}
+            + least(greatest(round((3 + rating_z)::numeric, 2), 0), 5),
+        contact_info::json,
+        to_jsonb(contact_info),
+        ('POINT(' || longitude || ' ' || latitude || ')')::geometry
+    FROM (
+        SELECT
+            n,
+            sqrt(-2 * ln(1 - random())) * cos(2 * pi() * random()) AS age_z,
+            sqrt(-2 * ln(1 - random())) * cos(2 * pi() * random()) AS rating_z,
+            '{{"phone": "{company_area_code}-555-'
+                || (1000 + floor(random() * 9000)) || '", "email": "filler.'
+                || n || '@company.com"}}' AS contact_info,
+            {chicago_longitude_bounds[0]}
+                + random() * {chicago_longitude_bounds[1] - chicago_longitude_bounds[0]}
+                AS longitude,
+            {chicago_latitude_bounds[0]}
+                + random() * {chicago_latitude_bounds[1] - chicago_latitude_bounds[0]}
+                AS latitude
+        FROM generate_series(1, %s) AS n
+    ) AS filler
     """
-    bjson_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_bjson = """
-        SELECT employee_id, bjson_contact_info
-        FROM employees
-        WHERE employee_id = %s AND bjson_contact_info::jsonb = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_bjson, (row[0], row[6]))
-        toc = time.perf_counter()
-        bjson_query_read_times.append(toc - tic)
+
+
+def add_filler_rows(count):
+    cursor.execute("SELECT setseed(%s)", (filler_seed,))
+    cursor.execute(filler_insert_query, (filler_first_id, count))
+
+
+# (dataset rows, table rows) of the padded table the last cell left in place for the
+# next cell of the same size, None once the table is cleared
+kept_fixture = {"key": None}
+
+
+def release_kept_fixture():
+    # Clear a padded table kept from an earlier cell
+    if kept_fixture["key"] is not None:
+        cursor.execute("TRUNCATE TABLE employees")
+        db_connection.commit()
+        kept_fixture["key"] = None
+
+
+def load_fixture(workload, employee_data):
+    # Fill the table with the whole dataset for the sampled rows to be found in,
+    # padded with filler rows when the cell runs against a bigger table; a padded
+    # table is built once and kept for the cells of the same size after it
+    if kept_fixture["key"] is None:
+        insert_rows(employee_columns, employee_data, "copy")
+        if workload["table_rows"] is not None:
+            add_filler_rows(workload["table_rows"] - len(employee_data))
+    # Give the planner statistics to choose between the indexes of the profile
+    cursor.execute("ANALYZE employees")
+    # Committed so undoing a statement of the reps never takes the fixture with it
+    db_connection.commit()
+    if workload["table_rows"] is not None:
+        kept_fixture["key"] = (len(employee_data), workload["table_rows"])
+
+
+def load_update_fixture(workload, employee_data):
+    # Updates overwrite the sampled rows with the values of a fixed set of other rows
+    load_fixture(workload, employee_data)
+    workload["initial_samples"] = workload["rng"].sample(
+        employee_data, workload["num_rows"]
+    )
+
+
+def reset_truncate(workload):
     cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average bjson query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(bjson_query_read_times)/reps} seconds for a total of
-        {sum(bjson_query_read_times)} seconds using Python and psycopg2
-        """)
-    return bjson_query_read_times
 
 
-def update_bjson_query(reps, num_rows, faker_entries):
+def reset_delete_vacuum(workload):
+    # VACUUM cannot run inside a transaction, so the DELETE is committed before it;
+    # tagged so the server-side totals leave it out of the workload's deletes
+    cursor.execute(f"{reset_statement_tag} DELETE FROM employees")
+    set_workload_autocommit(True)
+    cursor.execute("VACUUM employees")
+    set_workload_autocommit(False)
+
+
+def serial_sequence():
+    # Sequence employee_id draws from, None for a shard copy that does not own it
+    cursor.execute("SELECT pg_get_serial_sequence('employees', 'employee_id')")
+    return cursor.fetchone()[0]
+
+
+def restore_table(workload):
+    # LIKE copies leave the indexes and storage options out, so a new table gets its own
+    cursor.execute("ALTER TABLE employees ADD PRIMARY KEY (employee_id)")
+    apply_index_profile(workload["index_profile"])
+    apply_table_tuning(workload["tuning_profile"])
+
+
+def create_reset_template(workload):
+    cursor.execute(
+        "CREATE TABLE employees_template"
+        " (LIKE employees INCLUDING ALL EXCLUDING INDEXES)"
+    )
+
+
+def drop_reset_template(workload):
+    cursor.execute("DROP TABLE employees_template")
+
+
+def reset_template(workload):
+    # Drop the table and create it again from the empty template, keeping the
+    # sequence employee_id defaults to alive across the drop
+    sequence = serial_sequence()
+    if sequence is not None:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    cursor.execute("DROP TABLE employees")
+    cursor.execute(
+        "CREATE TABLE employees"
+        " (LIKE employees_template INCLUDING ALL EXCLUDING INDEXES)"
+    )
+    if sequence is not None:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY employees.employee_id")
+    restore_table(workload)
+
+
+def reset_swap(workload):
+    # Build an empty copy next to the table, then drop the table and rename the copy
+    sequence = serial_sequence()
+    cursor.execute(
+        "CREATE TABLE employees_next (LIKE employees INCLUDING ALL EXCLUDING INDEXES)"
+    )
+    if sequence is not None:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY employees_next.employee_id")
+    cursor.execute("DROP TABLE employees")
+    cursor.execute("ALTER TABLE employees_next RENAME TO employees")
+    restore_table(workload)
+
+
+# Ways of emptying the table between the reps of a create workload and after every
+# cell, with what each needs set up before the cell and cleaned up after it
+reset_strategies = {
+    "truncate": {"setup": None, "reset": reset_truncate, "teardown": None},
+    "delete_vacuum": {"setup": None, "reset": reset_delete_vacuum, "teardown": None},
+    "template": {
+        "setup": create_reset_template,
+        "reset": reset_template,
+        "teardown": drop_reset_template,
+    },
+    "swap": {"setup": None, "reset": reset_swap, "teardown": None},
+}
+
+
+def reset_table(workload):
+    # Empty the table the chosen way, returning how long it took
+    tic = time.perf_counter()
+    reset_strategies[workload["reset_strategy"]]["reset"](workload)
+    return time.perf_counter() - tic
+
+
+def project_rows(workload, sampled_data):
+    project = workload["project"]
+    return [project(row) for row in sampled_data]
+
+
+def project_matches(workload, sampled_data):
+    project = workload["project_match"]
+    return [project(row) for row in sampled_data]
+
+
+def project_reads(workload, sampled_data):
+    # Batched reads also carry each sampled row's id to check it was found
+    if workload["read_mode"] == "batched":
+        project = workload["project_match"]
+        return [(row[0],) + project(row) for row in sampled_data]
+    return project_matches(workload, sampled_data)
+
+
+def project_updates(workload, sampled_data):
+    project = workload["project_match"]
+    project_set = workload["project_set"]
+    return [
+        project_set(initial) + project(row)
+        for initial, row in zip(workload["initial_samples"], sampled_data)
+    ]
+
+
+def run_inserts(workload, params_list):
+    insert_rows(
+        workload["columns"],
+        params_list,
+        workload["insert_strategy"],
+        workload["page_size"],
+        workload["prepared"],
+        workload["workers"],
+        workload["backend"],
+    )
+
+
+def run_reads(workload, params_list):
+    if workload["read_mode"] == "batched":
+        read_rows_batched(
+            workload["select"],
+            workload["match"],
+            params_list,
+            workload["chunk_size"],
+            workload["workers"],
+            workload["backend"],
+            workload["predicate"],
+        )
+    else:
+        execute_rows(
+            workload["query"],
+            params_list,
+            workload["prepared"],
+            workers=workload["workers"],
+            backend=workload["backend"],
+            fetch_mode=workload["fetch_mode"],
+            itersize=workload["itersize"],
+        )
+
+
+def run_updates(workload, params_list):
+    # Warm-up reps undo their updates so the timed reps find the fixture as it was,
+    # and so do the reps on a padded table the next cell of its size reuses
+    execute_rows(
+        workload["query"],
+        params_list,
+        workload["prepared"],
+        undo=workload["warming_up"] or workload["table_rows"] is not None,
+        workers=workload["workers"],
+        backend=workload["backend"],
+    )
+
+
+def run_deletes(workload, params_list):
+    # Undo every delete so each rep finds the same rows in the committed fixture
+    execute_rows(
+        workload["query"],
+        params_list,
+        workload["prepared"],
+        undo=True,
+        workers=workload["workers"],
+        backend=workload["backend"],
+    )
+
+
+def inserts_planned(workload):
+    return workload["insert_strategy"] in ("row", "executemany")
+
+
+# How each operation sets up, builds its statement and parameters, and runs a rep;
+# "planned" tells whether the rep sent its statements one at a time to be planned
+# and "replay_on_resume" whether its reps leave changes later reps depend on
+operation_specs = {
+    "create": {
+        "label": "insertion",
+        "setup": None,
+        "query": lambda workload: insert_query_for(workload["columns"]),
+        "params": project_rows,
+        "run": run_inserts,
+        "replay_on_resume": False,
+        "reset_every_rep": True,
+        "planned": inserts_planned,
+        "summary": lambda workload: f"with {workload['insert_strategy']} inserts",
+    },
+    "read": {
+        "label": "query read time",
+        "setup": load_fixture,
+        "query": select_query_for,
+        "params": project_reads,
+        "run": run_reads,
+        "replay_on_resume": False,
+        "reset_every_rep": False,
+        "planned": lambda workload: workload["read_mode"] == "row",
+        "summary": lambda workload: f"with {workload['read_mode']} reads"
+        f" and {workload['fetch_mode']} fetches",
+    },
+    "update": {
+        "label": "query update time",
+        "setup": load_update_fixture,
+        "query": update_query_for,
+        "params": project_updates,
+        "run": run_updates,
+        "replay_on_resume": True,
+        "reset_every_rep": False,
+        "planned": lambda workload: True,
+        "summary": lambda workload: "with one statement per row",
+    },
+    "delete": {
+        "label": "query delete time",
+        "setup": load_fixture,
+        "query": delete_query_for,
+        "params": project_matches,
+        "run": run_deletes,
+        "replay_on_resume": False,
+        "reset_every_rep": False,
+        "planned": lambda workload: True,
+        "summary": lambda workload: "with one statement per row",
+    },
+}
+
+
+def run_workload(
+    operation,
+    data_type,
+    reps,
+    num_rows,
+    faker_entries,
+    insert_strategy="row",
+    page_size=100,
+    read_mode="row",
+    chunk_size=100,
+    fetch_mode="none",
+    itersize=2000,
+    table_rows=None,
+    index_profile="none",
+    predicate="equality",
+    predicate_mode="pk_typed",
+    prepared=False,
+    workers=1,
+    backend="psycopg2",
+    timer=time.perf_counter,
+    statement_latencies=False,
+    latency_state=None,
+    server_stats=False,
+    explain_fraction=0.0,
+    transaction_mode="cell",
+    commit_rows=100,
+    reset_strategy="truncate",
+    tuning_profile="default",
+    cache_mode="none",
+    warmup_reps=5,
+    prewarm=False,
+    cold_method="discard",
+    client_profile=False,
+    cprofile=False,
+    trace_memory=False,
+    ci_width=None,
+    ci_percentile=0.5,
+    ci_confidence=0.95,
+    min_reps=30,
+    prior_times=(),
+    on_rep=None,
+    on_commit=None,
+    on_reset=None,
+    on_plan=None,
+    on_latency=None,
+    on_server=None,
+    on_explain=None,
+    on_profile=None,
+    on_adaptive=None,
+    rng=random,
+    first_rep=0,
+    rng_state=None,
+):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
+    operation {str}: one of operation_specs, the kind of statement to time
+    data_type {str}: one of data_type_specs, the columns the statements work on
+    reps {int}: number of repetitions of the operation, the most run when adaptive
+    num_rows {int}: number of sampled rows every rep works on
     faker_entries {int}: number of fake entries to sample from without replacement
+    insert_strategy {str}: one of insert_strategies, "row" inserts one row at a time
+    page_size {int}: rows per INSERT statement for the execute_values strategy
+    read_mode {str}: one of read_modes, "row" sends one SELECT per sampled row
+    chunk_size {int}: rows fetched at a time in the batched read mode
+    fetch_mode {str}: one of fetch_modes, how row mode reads pull their results back
+    itersize {int}: rows a named cursor fetches per round trip in the named fetch mode
+    table_rows {int}: rows in the table the reads, updates and deletes run against,
+        the faker_entries dataset padded with filler rows; None keeps the dataset alone
+    index_profile {str}: one of index_profiles, secondary indexes built before the cell
+    predicate {str}: one of predicate_variants, how the sampled rows are matched
+    predicate_mode {str}: one of predicate_modes, which columns the rows are matched on
+    prepared {bool}: run the statements through server-side prepared statements
+    workers {int}: number of client threads the sampled rows are split across
+    backend {str}: one of backends, "asyncio" runs the timed statements on psycopg
+    timer {function}: clock read before and after every rep
+    statement_latencies {bool}: also time every statement sent one at a time with
+        perf_counter_ns into the latency histogram of the cell
+    latency_state {dict}: saved histogram of the reps before first_rep when resuming
+    server_stats {bool}: diff pg_stat_statements around the reps for the server's
+        execution and planning time and buffer use, if the extension is loaded
+    explain_fraction {float}: fraction of each rep's statements to also run under
+        EXPLAIN (ANALYZE, BUFFERS) after the rep, outside the timed region
+    transaction_mode {str}: one of transaction_modes, "cell" commits once after the
+        reps, outside their timings; pooled and async connections commit every slice
+    commit_rows {int}: rows run between commits in the "rows" transaction mode
+    reset_strategy {str}: one of reset_strategies, how the table is emptied after
+        every create rep and after the cell, outside the timed region
+    tuning_profile {str}: one of tuning_profiles, session settings and table storage
+        options applied before the cell and set back to the defaults after it
+    cache_mode {str}: one of cache_modes, "none" tells the first rep apart from the
+        steady state after it, "warm" runs warmup_reps discarded reps first, and
+        "cold" makes the caches cold before every rep, outside the timed region
+    warmup_reps {int}: reps run and thrown away before the timed ones in warm mode
+    prewarm {bool}: also load the table and its indexes with pg_prewarm in warm mode
+    cold_method {str}: one of cold_methods, how cold mode makes the caches cold
+    client_profile {bool}: send the psycopg2 statements through a ProfilingCursor,
+        splitting the client time into parameter adaptation, round trips, result
+        handling and the rest of the Python in the timed region; with more than one
+        worker the parts are summed over the threads and can exceed the reps' time
+    cprofile {bool}: run the timed region of every rep under cProfile
+    trace_memory {bool}: trace the Python allocations of the reps with tracemalloc
+    ci_width {float}: stop once the confidence interval of the ci_percentile rep time
+        is narrower than this fraction of it, None runs all the reps
+    ci_percentile {float}: percentile of the rep times the adaptive mode estimates
+    ci_confidence {float}: coverage of the interval the adaptive mode narrows
+    min_reps {int}: reps always run before the adaptive mode may stop
+    prior_times {list}: rep times before first_rep when resuming an adaptive cell
+    on_rep {function}: called as on_rep(rep, seconds, parts, cache_state) once a
+        rep is timed and reset, parts giving the seconds of each of rep_parts
+    on_commit {function}: called as on_commit(seconds) with the time of the commit
+        closing the cell's transaction in the "cell" transaction mode
+    on_reset {function}: called as on_reset(seconds) with the time of the reset
+        emptying the table after the cell
+    on_plan {function}: called as on_plan(plan) with the plan of the last statement
+    on_latency {function}: called as on_latency(state) with the final histogram
+    on_server {function}: called as on_server(server) with the pg_stat_statements diff
+    on_explain {function}: called as on_explain(rep, explain) per explained statement
+    on_profile {function}: called as on_profile(profile, profiler) with the client
+        profile of the reps and the cProfile.Profile of their timed regions, if any
+    on_adaptive {function}: called as on_adaptive(adaptive) in the adaptive mode with
+        the reps the cell needed and the interval they stopped at
+    rng {random.Random}: source of the sampled rows, the shared random module by default
+    first_rep {int}: rep to start from when carrying on with an interrupted cell
+    rng_state {tuple}: state of rng after first_rep - 1 reps, restored after the setup
     """
-    bjson_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_bjson = """
-        UPDATE employees
-        SET bjson_contact_info = %s
-        WHERE employee_id = %s AND bjson_contact_info::jsonb = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                update_query_bjson,
-                (initial_samples[j][6],) + (sampled_data[j][0], sampled_data[j][6]),
+    if read_mode not in read_modes:
+        raise ValueError(f"Unknown read mode {read_mode!r}")
+    if read_mode == "batched" and transaction_mode == "autocommit":
+        raise ValueError(
+            "Batched reads DECLARE a named cursor, which needs a transaction"
+        )
+    if read_mode == "batched" and fetch_mode != "none":
+        raise ValueError("Batched reads always fetch their rows in chunks")
+    if fetch_mode == "named" and prepared:
+        raise ValueError("A named cursor cannot DECLARE a prepared statement")
+    if table_rows is not None and operation_specs[operation]["setup"] is None:
+        raise ValueError("Creates start every rep from an empty table")
+    if table_rows is not None and table_rows < faker_entries:
+        raise ValueError("The table holds at least the whole dataset")
+    if index_profile not in index_profiles:
+        raise ValueError(f"Unknown index profile {index_profile!r}")
+    if predicate not in predicate_variants:
+        raise ValueError(f"Unknown predicate variant {predicate!r}")
+    if predicate_mode not in predicate_modes:
+        raise ValueError(f"Unknown predicate mode {predicate_mode!r}")
+    if client_profile and backend == "asyncio":
+        raise ValueError("The client profile only wraps psycopg2 cursors")
+    if ci_width is not None and not 0 < ci_percentile < 1:
+        raise ValueError("The adaptive mode estimates a percentile between 0 and 1")
+    if cache_mode not in cache_modes:
+        raise ValueError(f"Unknown cache mode {cache_mode!r}")
+    if cold_method not in cold_methods:
+        raise ValueError(f"Unknown cold method {cold_method!r}")
+    if prewarm and cache_mode != "warm":
+        raise ValueError("Only the warm cache mode prewarms the table")
+    if cache_mode == "cold" and cold_method == "evict" and not evict_table_buffers():
+        raise RuntimeError("Evicting buffers needs pg_buffercache 1.5, PostgreSQL 17")
+    if tuning_profile not in tuning_profiles:
+        raise ValueError(f"Unknown tuning profile {tuning_profile!r}")
+    if reset_strategy not in reset_strategies:
+        raise ValueError(f"Unknown reset strategy {reset_strategy!r}")
+    if transaction_mode not in transaction_modes:
+        raise ValueError(f"Unknown transaction mode {transaction_mode!r}")
+    if transaction_mode != "cell" and operation == "delete":
+        raise ValueError("Deletes undo every statement, they commit nothing")
+    if transaction_mode == "autocommit" and fetch_mode == "named":
+        raise ValueError("A named cursor needs a transaction to DECLARE in")
+    if (
+        transaction_mode == "autocommit"
+        and table_rows is not None
+        and operation != "read"
+    ):
+        raise ValueError(
+            "Writes to a padded table are undone, which needs a transaction"
+        )
+    operation_spec = operation_specs[operation]
+    data_type_spec = data_type_specs[data_type]
+    columns = data_type_spec["columns"]
+    select_columns = data_type_spec.get("select", columns)
+    match_columns = predicate_modes[predicate_mode](columns)
+    # Everything the hooks need to know about this cell
+    workload = {
+        "num_rows": num_rows,
+        "table_rows": table_rows,
+        "columns": columns,
+        "select": select_columns,
+        "match": match_columns,
+        "predicate": predicate,
+        "project": row_projection(columns),
+        "project_match": row_projection(match_columns),
+        "project_set": row_projection(columns[1:]),
+        "insert_strategy": insert_strategy,
+        "page_size": page_size,
+        "read_mode": read_mode,
+        "chunk_size": chunk_size,
+        "fetch_mode": fetch_mode,
+        "itersize": itersize,
+        "prepared": prepared,
+        "workers": workers,
+        "backend": backend,
+        "index_profile": index_profile,
+        "reset_strategy": reset_strategy,
+        "tuning_profile": tuning_profile,
+        "rng": rng,
+        "warming_up": False,
+    }
+    workload["query"] = operation_spec["query"](workload)
+    query_times = []
+    employee_data = load_faker_data(faker_entries)
+    if kept_fixture["key"] != (faker_entries, table_rows):
+        release_kept_fixture()
+    apply_index_profile(index_profile)
+    apply_tuning_profile(tuning_profile)
+    reset_spec = reset_strategies[reset_strategy]
+    if reset_spec["setup"] is not None:
+        reset_spec["setup"](workload)
+    if operation_spec["setup"] is not None:
+        operation_spec["setup"](workload, employee_data)
+    if first_rep > 0 and operation_spec["replay_on_resume"] and table_rows is None:
+        # The fixture is built afresh on resume, so apply the changes of the reps
+        # before first_rep again, untimed, drawing the same samples they drew; a
+        # padded table had every change undone
+        for _ in range(0, first_rep):
+            replay_data = rng.sample(employee_data, num_rows)
+            operation_spec["run"](
+                workload, operation_spec["params"](workload, replay_data)
             )
-        toc = time.perf_counter()
-        bjson_query_update_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average bjson query update time of {num_rows}
+    if rng_state is not None:
+        rng.setstate(rng_state)
+    if cache_mode == "warm":
+        # Warm-up reps sample on their own so the timed reps sample the same rows
+        warmup_rng = random.Random(f"warmup:{operation}:{data_type}")
+        workload["warming_up"] = True
+        for _ in range(0, warmup_reps):
+            warmup_data = warmup_rng.sample(employee_data, num_rows)
+            operation_spec["run"](
+                workload, operation_spec["params"](workload, warmup_data)
+            )
+            if operation_spec["reset_every_rep"]:
+                reset_table(workload)
+        workload["warming_up"] = False
+        if prewarm:
+            prewarm_table()
+    # The replayed and warm-up reps ran through the workers too, only the timed reps
+    # count towards their latencies
+    worker_latencies.clear()
+    if statement_latencies:
+        start_latency_histogram(latency_state)
+    server_stats = server_stats and pg_stat_statements_available()
+    if server_stats:
+        server_before = snapshot_pg_stat_statements()
+    explains = []
+    if client_profile:
+        start_client_profile()
+    profiler = cProfile.Profile() if cprofile else None
+    if trace_memory:
+        tracemalloc.start()
+        memory_before = tracemalloc.take_snapshot()
+    part_times = {part: [] for part in rep_parts}
+    # Every rep time of the cell kept sorted for the adaptive mode's interval, which
+    # only stops a cell after a rep so a resumed cell always has one to report on
+    ordered_times = sorted(prior_times)
+    for i in range(first_rep, reps):
+        if ci_width is not None and query_times and len(ordered_times) >= min_reps:
+            ci = percentile_ci(ordered_times, ci_percentile, ci_confidence)
+            if ci["relative_width"] is not None and ci["relative_width"] < ci_width:
+                break
+        sampled_data = rng.sample(employee_data, num_rows)
+        if cache_mode == "cold":
+            make_caches_cold(cold_method)
+            cache_state = f"cold_{cold_method}"
+        elif cache_mode == "warm":
+            cache_state = "warm"
+        else:
+            # Only the cell's very first rep, not the first one after a resume
+            cache_state = "first" if i == 0 else "steady"
+        if transaction_mode == "autocommit":
+            set_workload_autocommit(True)
+        if workers > 1 or backend == "asyncio":
+            # The last reset would otherwise be committed inside the timed region
+            db_connection.commit()
+        commit_state["seconds"] = 0.0
+        commit_state["undo_seconds"] = 0.0
+        commit_state["undo_wall_seconds"] = 0.0
+        if profiler is not None:
+            profiler.enable()
+        tic = timer()
+        sampled_params = operation_spec["params"](workload, sampled_data)
+        if transaction_mode == "rows":
+            for start in range(0, len(sampled_params), commit_rows):
+                operation_spec["run"](
+                    workload, sampled_params[start : start + commit_rows]
+                )
+                commit_workload()
+        else:
+            operation_spec["run"](workload, sampled_params)
+            if transaction_mode == "rep":
+                commit_workload()
+        toc = timer()
+        if profiler is not None:
+            profiler.disable()
+        if transaction_mode == "autocommit":
+            set_workload_autocommit(False)
+        # Deletes are timed without the undo that puts their rows back
+        rep_seconds = toc - tic - commit_state["undo_wall_seconds"]
+        query_times.append(rep_seconds)
+        bisect.insort(ordered_times, rep_seconds)
+        parts = {
+            "commit": commit_state["seconds"],
+            "undo": commit_state["undo_seconds"],
+            "reset": reset_table(workload) if operation_spec["reset_every_rep"] else 0,
+        }
+        for part in rep_parts:
+            part_times[part].append(parts[part])
+        if on_rep is not None:
+            on_rep(i, rep_seconds, parts, cache_state)
+        # Only statements sent one at a time match the single row statement explained
+        if explain_fraction > 0 and operation_spec["planned"](workload):
+            for params in sampled_params[:: max(round(1 / explain_fraction), 1)]:
+                explains.append(explain_analyze(workload["query"], params))
+                if on_explain is not None:
+                    on_explain(i, explains[-1])
+    if transaction_mode == "cell":
+        commit_state["seconds"] = 0.0
+        commit_workload()
+        if on_commit is not None:
+            on_commit(commit_state["seconds"])
+    latency = stop_latency_histogram() if statement_latencies else None
+    if client_profile or cprofile or trace_memory:
+        profile = {
+            "reps": len(query_times),
+            "seconds": sum(query_times),
+            **(stop_client_profile() if client_profile else {}),
+            "memory_peak": None,
+            "memory_top": [],
+            "cprofile_top": [] if profiler is None else profile_top_functions(profiler),
+        }
+        if client_profile:
+            profile["other"] = profile["seconds"] - sum(
+                profile[part] for part in client_profile_parts
+            )
+        if trace_memory:
+            profile["memory_peak"] = tracemalloc.get_traced_memory()[1]
+            profile["memory_top"] = memory_top_lines(
+                memory_before, tracemalloc.take_snapshot()
+            )
+            tracemalloc.stop()
+    if ci_width is not None:
+        adaptive = {
+            "reps": len(ordered_times),
+            "max_reps": reps,
+            "min_reps": min_reps,
+            "ci_width": ci_width,
+            **percentile_ci(ordered_times, ci_percentile, ci_confidence),
+        }
+        adaptive["converged"] = (
+            adaptive["relative_width"] is not None
+            and adaptive["relative_width"] < ci_width
+        )
+    if server_stats:
+        server = diff_pg_stat_statements(server_before, snapshot_pg_stat_statements())
+    if operation == "read" and read_mode == "batched":
+        # The VALUES join over the whole sample, as a single worker would run it
+        plan = describe_plan(workload["query"], sampled_params, batched=True)
+    else:
+        plan = describe_plan(workload["query"], sampled_params[0])
+    if on_plan is not None:
+        on_plan(plan)
+    # Planned on the cell's table, indexes and settings, before the teardown
+    planning_seconds = None
+    if not prepared and operation_spec["planned"](workload):
+        planning_seconds = measure_planning_time(workload["query"], sampled_params)
+    if not operation_spec["reset_every_rep"] and kept_fixture["key"] is None:
+        cell_reset = reset_table(workload)
+        if on_reset is not None:
+            on_reset(cell_reset)
+    if reset_spec["teardown"] is not None:
+        reset_spec["teardown"](workload)
+    apply_index_profile("none")
+    # Also commits the cleared table and indexes for the pooled connections and the
+    # next cell
+    apply_tuning_profile("default")
+    print(f"""Average {data_type} {operation_spec["label"]} of {num_rows}
         rows of random data from {faker_entries} employee entries
-        took {sum(bjson_query_update_times)/reps} seconds for a total of
-        {sum(bjson_query_update_times)} seconds using Python and psycopg2
+        {"" if table_rows is None else f"in a table padded to {table_rows} rows"}
+        took {sum(query_times)/len(query_times)} seconds for a total of
+        {sum(query_times)} seconds using Python and {backend}
+        {operation_spec["summary"](workload)}
+        at {num_rows * len(query_times) / sum(query_times)} rows/sec
+        with {index_profile} indexes and {predicate_mode} {predicate} predicates
+        under the {tuning_profile} tuning profile with {cache_mode} caches
+        planned as {plan}
+        in {transaction_mode} transactions, {sum(part_times["commit"])} seconds
+        committing and {sum(part_times["undo"])} seconds undoing, then
+        {sum(part_times["reset"])} seconds resetting with {reset_strategy}
         """)
-    return bjson_query_update_times
+    if ci_width is not None:
+        if on_adaptive is not None:
+            on_adaptive(adaptive)
+        report_adaptive(adaptive)
+    if server_stats:
+        if on_server is not None:
+            on_server(server)
+        report_server_time(server, query_times)
+    if explains:
+        report_explains(explains)
+    if client_profile or cprofile or trace_memory:
+        if on_profile is not None:
+            on_profile(profile, profiler)
+        report_client_profile(profile)
+    if latency is not None:
+        if on_latency is not None:
+            on_latency(latency)
+        if latency_percentiles(latency) is not None:
+            report_latency(latency_percentiles(latency))
+    if workers > 1 or backend == "asyncio":
+        report_concurrency(num_rows, query_times)
+    if planning_seconds is not None:
+        report_planning_time(planning_seconds, len(sampled_params))
+    return query_times
+
+
+# Whether to also write the timings of a finished run to an Excel file
+export_excel = True
+
+# Whether every statement sent one at a time is also timed into a latency histogram
+record_statement_latencies = True
+
+# Whether every cell also diffs pg_stat_statements for the server's side of its time
+capture_server_stats = True
+
+# Fraction of every rep's statements also run under EXPLAIN (ANALYZE, BUFFERS)
+explain_analyze_fraction = 0.01
+
+# Transaction modes the create and update workloads are run again in, the default
+# "cell" mode is covered by the default workloads
+matrix_transaction_modes = ("rep", "rows", "autocommit")
+
+# Ways the matrix makes the caches cold; "evict" needs PostgreSQL 17's pg_buffercache
+matrix_cold_methods = ("discard", "reconnect")
+
+# Whether to add every default workload again with its client time broken down, and
+# again under cProfile and tracemalloc, whose overhead inflates that cell's timings
+profile_client_cells = False
+
+# Seed every cell's sampling is derived from, None draws one and records it in run.json
+run_seed = None
+
+# Target relative width of the 95% confidence interval of every cell's median rep
+# time; cells stop once it is reached, after at least adaptive_min_reps and at most
+# the matrix's reps. None runs every cell for all its reps as earlier runs did
+adaptive_ci_width = None
+adaptive_min_reps = 30
+
+# Percentile of the rep times the adaptive mode narrows the interval of
+adaptive_percentile = 0.5
+
+# Whether to checkpoint every rep, rather than only every finished cell
+checkpoint_reps = True
+
+# Directory of an interrupted run to carry on with, None starts a new run
+resume_run_dir = None
+
+# Whether to also run the scaling sweep after the matrix, into a run of its own
+run_scaling_sweep = False
+
+# Table sizes and rows per rep the sweep runs every read, update and delete workload
+# at; creates are left out as they start every rep from an empty table
+sweep_table_rows = (5000, 50000, 500000, 5000000, 10000000)
+sweep_num_rows = (10, 100, 1000)
+
+# Faker entries the rows are sampled from at every table size, capped so bigger
+# tables are padded with filler rows generated on the server
+sweep_faker_entries = 100000
+
+# Lookups the sweep runs, with and without employee_id, to see where the access path
+# of the typed columns alone stops scaling; neither matches a filler row, so both
+# touch the same sampled rows at every table size
+sweep_predicate_modes = ("pk_typed", "typed_only")
+
+sweep_reps = 50
+
+# Directory of an interrupted sweep to carry on with, None starts a new one
+resume_sweep_dir = None
+
+# Processes the workload matrix is spread over; 1 runs one cell at a time in
+# this process for contention-free timings, more is meant for fast smoke runs
+matrix_processes = 1
+
+
+# Directory every run streams its timings to, one subdirectory per run
+results_dir = "results"
+
+# Columns of the timings files, one line per measured rep
+timing_fields = (
+    "column",
+    "operation",
+    "data_type",
+    "options",
+    "tuning_profile",
+    "cache_state",
+    "rep",
+    "seconds",
+    "commit_seconds",
+    "undo_seconds",
+    "reset_seconds",
+    "recorded_at",
+)
 
 
-def delete_bjson_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    bjson_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_json = """
-        DELETE FROM employees
-        WHERE employee_id = %s AND bjson_contact_info::jsonb = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(delete_query_json, (sampled_data[j][0], sampled_data[j][6]))
-            db_connection.rollback()
-        toc = time.perf_counter()
-        bjson_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average bjson query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(bjson_query_delete_times)/reps} seconds for a total of
-        {sum(bjson_query_delete_times)} seconds using Python and psycopg2
-        """)
-    return bjson_query_delete_times
+def start_results_run(cells, reps, num_rows, faker_entries, processes=1):
+    # Create the directory of a new run and record what it is about to measure
+    run_dir = os.path.join(results_dir, time.strftime("run_%Y%m%d_%H%M%S"))
+    os.makedirs(os.path.join(run_dir, "checkpoints"))
+    metadata = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "finished_at": None,
+        "reps": reps,
+        "num_rows": num_rows,
+        "faker_entries": faker_entries,
+        "processes": processes,
+        "generator_version": generator_version,
+        "faker_seed": faker_seed,
+        "seed": random.randrange(2**32) if run_seed is None else run_seed,
+        "database": {
+            key: db_params.get(key) for key in ("dbname", "host", "port", "user")
+        },
+        "server_version": db_connection.server_version,
+        "psycopg2_version": psycopg2.__version__,
+        "adaptive": adaptive_settings(),
+        "columns": [column for column, operation, data_type, options in cells],
+    }
+    write_run_metadata(run_dir, metadata)
+    return run_dir
 
 
-def read_geometry_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    geometry_query_read_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        select_query_geometry = """
-        SELECT employee_id, address
-        FROM employees
-        WHERE employee_id = %s AND address::geometry = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for row in sampled_data:
-            cursor.execute(select_query_geometry, (row[0], row[7]))
-        toc = time.perf_counter()
-        geometry_query_read_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average geometry query read time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(geometry_query_read_times)/reps} seconds for a total of
-        {sum(geometry_query_read_times)} seconds using Python and psycopg2
-        """)
-    return geometry_query_read_times
+def adaptive_settings():
+    # Adaptive mode of the run, recorded so a resumed run stops its cells alike
+    return {
+        "ci_width": adaptive_ci_width,
+        "min_reps": adaptive_min_reps,
+        "percentile": adaptive_percentile,
+    }
 
 
-def update_geometry_query(reps, num_rows, faker_entries):
-    """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
-    faker_entries {int}: number of fake entries to sample from without replacement
-    """
-    geometry_query_update_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    initial_samples = random.sample(employee_data, num_rows)
-    for i in range(0, reps):
-        update_query_geometry = """
-        UPDATE employees
-        SET address = %s
-        WHERE employee_id = %s AND address::geometry = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
-        tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                update_query_geometry,
-                (initial_samples[j][7],) + (sampled_data[j][0], sampled_data[j][7]),
+def write_json_file(path, data):
+    # Replace the file in one rename so it is never seen half written
+    with open(path + ".tmp", "w") as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def read_json_file(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def write_run_metadata(run_dir, metadata):
+    write_json_file(os.path.join(run_dir, "run.json"), metadata)
+
+
+def read_run_metadata(run_dir):
+    return read_json_file(os.path.join(run_dir, "run.json"))
+
+
+def resume_results_run(run_dir, cells, reps, num_rows, faker_entries):
+    # Reopen an interrupted run after checking it measures the same matrix
+    metadata = read_run_metadata(run_dir)
+    expected = {
+        "reps": reps,
+        "num_rows": num_rows,
+        "faker_entries": faker_entries,
+        "generator_version": generator_version,
+        "adaptive": adaptive_settings(),
+        "columns": [column for column, operation, data_type, options in cells],
+    }
+    for key, value in expected.items():
+        recorded = metadata.get(key)
+        if recorded != value:
+            raise ValueError(
+                f"Cannot resume {run_dir}, it has {key} {recorded!r} not {value!r}"
             )
-        toc = time.perf_counter()
-        geometry_query_update_times.append(toc - tic)
+    # Clear whatever the interrupted cell had committed before it stopped
     cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average geometry query update time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(geometry_query_update_times)/reps} seconds for a total of
-        {sum(geometry_query_update_times)} seconds using Python and psycopg2
-        """)
-    return geometry_query_update_times
+    db_connection.commit()
+    kept_fixture["key"] = None
+    metadata["finished_at"] = None
+    metadata.setdefault("resumed_at", []).append(time.strftime("%Y-%m-%dT%H:%M:%S%z"))
+    write_run_metadata(run_dir, metadata)
+    return run_dir
+
+
+def finish_results_run(run_dir):
+    # Mark the run complete, a run without finished_at stopped part way through
+    metadata = read_run_metadata(run_dir)
+    metadata["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    write_run_metadata(run_dir, metadata)
+
+
+def checkpoint_path(run_dir, column):
+    return os.path.join(run_dir, "checkpoints", f"{column}.json")
+
+
+def load_checkpoint(run_dir, column, seed):
+    # Progress of a cell so far, or a fresh checkpoint for a cell not yet started
+    path = checkpoint_path(run_dir, column)
+    if os.path.exists(path):
+        return read_json_file(path)
+    return {
+        "seed": f"{seed}:{column}",
+        "rep": -1,
+        "rng_state": None,
+        "times": [],
+        **{f"{part}_times": [] for part in rep_parts},
+        "finished": False,
+    }
+
+
+def open_timings_file(run_dir):
+    # Every process appends to its own file so concurrent lines never interleave
+    path = os.path.join(run_dir, f"timings_{os.getpid()}.csv")
+    is_new = not os.path.exists(path)
+    timings_file = open(path, "a", newline="")
+    writer = csv.writer(timings_file)
+    if is_new:
+        writer.writerow(timing_fields)
+    return timings_file, writer
+
+
+def load_timings(run_dir):
+    # Every rep of a run as recorded, one row per rep of every cell
+    paths = sorted(
+        os.path.join(run_dir, name)
+        for name in os.listdir(run_dir)
+        if name.startswith("timings_") and name.endswith(".csv")
+    )
+    timings = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    # A rep redone after an interruption replaces the one recorded before it
+    return timings.sort_values("recorded_at").drop_duplicates(
+        ["column", "rep"], keep="last"
+    )
+
+
+def load_results(run_dir):
+    # Timings of a run, one column per cell in the order the run listed them
+    metadata = read_run_metadata(run_dir)
+    timings = load_timings(run_dir)
+    df = timings.pivot(index="rep", columns="column", values="seconds")
+    return df.reindex(columns=[c for c in metadata["columns"] if c in df.columns])
+
+
+def load_cache_summary(run_dir):
+    # Rep times of every cell split by the cache state they ran in, so first-hit and
+    # cold reps are summarised apart from the steady state
+    metadata = read_run_metadata(run_dir)
+    summary = (
+        load_timings(run_dir)
+        .groupby(["column", "cache_state"], sort=False)["seconds"]
+        .agg(["count", "mean", "median", "min", "max"])
+        .reset_index()
+    )
+    order = {column: index for index, column in enumerate(metadata["columns"])}
+    return summary.sort_values("column", key=lambda columns: columns.map(order))
+
+
+def iter_checkpoints(run_dir):
+    # Checkpoint of every cell of a run that got started, in the order the run listed
+    # them, with the labels every summary row starts with
+    metadata = read_run_metadata(run_dir)
+    for column in metadata["columns"]:
+        path = checkpoint_path(run_dir, column)
+        if not os.path.exists(path):
+            continue
+        checkpoint = read_json_file(path)
+        labels = {
+            "column": column,
+            "data_type": checkpoint.get("data_type"),
+            "operation": checkpoint.get("operation"),
+            "tuning_profile": checkpoint.get("tuning_profile", "default"),
+        }
+        yield labels, checkpoint
+
+
+def load_latency_summary(run_dir):
+    # Statement latency percentiles of every cell that recorded them, one row each
+    rows = []
+    for labels, checkpoint in iter_checkpoints(run_dir):
+        percentiles = checkpoint.get("latency_percentiles")
+        if percentiles is not None:
+            rows.append({**labels, **percentiles})
+    return pd.DataFrame(rows)
+
+
+def load_server_summary(run_dir):
+    # Client time next to the server's view of every cell, one row per cell
+    rows = []
+    for labels, checkpoint in iter_checkpoints(run_dir):
+        row = {
+            **labels,
+            "client": sum(checkpoint["times"]),
+            "client_commit": sum(checkpoint.get("commit_times", []))
+            + checkpoint.get("cell_commit", 0),
+            "client_undo": sum(checkpoint.get("undo_times", [])),
+            "client_reset": sum(checkpoint.get("reset_times", []))
+            + checkpoint.get("cell_reset", 0),
+        }
+        for key, value in checkpoint.get("server", {}).items():
+            row[f"server_{key}"] = value
+        explain = checkpoint.get("explain")
+        if explain is not None:
+            row["explained_statements"] = explain["statements"]
+            for key in explain_fields:
+                row[f"explain_mean_{key}"] = explain[key] / explain["statements"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def load_client_profile_summary(run_dir):
+    # Client time breakdown of every profiled cell, one row each
+    rows = []
+    for labels, checkpoint in iter_checkpoints(run_dir):
+        profile = checkpoint.get("profile")
+        if profile is None:
+            continue
+        row = dict(labels)
+        for key in ("reps", "seconds", "statements") + client_profile_parts:
+            row[key] = profile.get(key)
+        row["other"] = profile.get("other")
+        row["memory_peak"] = profile["memory_peak"]
+        row["memory_top"] = (profile["memory_top"] or [None])[0]
+        row["cprofile_top"] = (profile["cprofile_top"] or [None])[0]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def load_adaptive_summary(run_dir):
+    # Reps every cell of an adaptive run needed and the interval it stopped at
+    rows = []
+    for labels, checkpoint in iter_checkpoints(run_dir):
+        adaptive = checkpoint.get("adaptive")
+        if adaptive is not None:
+            rows.append({**labels, **adaptive})
+    return pd.DataFrame(rows)
+
+
+def load_scaling_summary(run_dir):
+    # Median rep time of every sweep cell by table size and rows per rep, with the
+    # plan its statements ran with so a change of access path shows where it happens
+    timings = load_timings(run_dir)
+    options = timings["options"].map(json.loads)
+    timings["predicate_mode"] = options.map(
+        lambda o: o.get("predicate_mode", "pk_typed")
+    )
+    timings["table_rows"] = options.map(lambda o: o["table_rows"])
+    timings["num_rows"] = options.map(lambda o: o["num_rows"])
+    summary = (
+        timings.groupby(
+            [
+                "column",
+                "operation",
+                "data_type",
+                "predicate_mode",
+                "table_rows",
+                "num_rows",
+            ],
+            sort=False,
+        )["seconds"]
+        .agg(["count", "median", "mean"])
+        .reset_index()
+    )
+    summary["median_per_row"] = summary["median"] / summary["num_rows"]
+    summary["rows_per_second"] = summary["num_rows"] / summary["median"]
+    summary["plan"] = [
+        read_json_file(checkpoint_path(run_dir, column)).get("plan")
+        for column in summary["column"]
+    ]
+    return summary.sort_values(
+        ["operation", "predicate_mode", "data_type", "num_rows", "table_rows"]
+    )
+
+
+def export_scaling_excel(run_dir, path):
+    # Spreadsheet of a sweep, every cell's summary then one sheet of scaling curves
+    # per operation and lookup, the median time per row against the table size
+    summary = load_scaling_summary(run_dir)
+    with pd.ExcelWriter(path) as writer:
+        summary.to_excel(writer, sheet_name="scaling", index=False)
+        for (operation, predicate_mode), curves in summary.groupby(
+            ["operation", "predicate_mode"], sort=False
+        ):
+            curves.pivot(
+                index="table_rows",
+                columns=["data_type", "num_rows"],
+                values="median_per_row",
+            ).to_excel(writer, sheet_name=f"{operation}_{predicate_mode}")
+
+
+def export_results_excel(run_dir, path):
+    # Optional spreadsheet of a run, its first sheet in the layout Statistical_Tests.R
+    # reads, then the rep times by cache state, latency percentiles, server-side time,
+    # client profile and adaptive stopping point of every cell
+    df = load_results(run_dir)
+    df.index.name = None
+    with pd.ExcelWriter(path) as writer:
+        df.to_excel(writer)
+        load_cache_summary(run_dir).to_excel(writer, sheet_name="cache", index=False)
+        load_latency_summary(run_dir).to_excel(
+            writer, sheet_name="latency", index=False
+        )
+        load_server_summary(run_dir).to_excel(writer, sheet_name="server", index=False)
+        load_client_profile_summary(run_dir).to_excel(
+            writer, sheet_name="client", index=False
+        )
+        load_adaptive_summary(run_dir).to_excel(
+            writer, sheet_name="adaptive", index=False
+        )
+
+
+def run_workload_cell(
+    column, operation, data_type, reps, num_rows, faker_entries, options, run_dir=None
+):
+    # Time a single workload cell and return its timings under its output column
+    options_text = json.dumps(options, sort_keys=True)
+    # Sweep cells carry their own rows per rep and dataset size in their options
+    options = dict(options)
+    num_rows = options.pop("num_rows", num_rows)
+    faker_entries = options.pop("faker_entries", faker_entries)
+    if run_dir is None:
+        times = run_workload(
+            operation, data_type, reps, num_rows, faker_entries, **options
+        )
+    else:
+        checkpoint = load_checkpoint(
+            run_dir, column, read_run_metadata(run_dir)["seed"]
+        )
+        if checkpoint["finished"]:
+            print(f"Skipping {column}, it finished before the run was interrupted")
+            return column, checkpoint["times"]
+        # Every cell samples from its own generator so skipped cells change nothing
+        rng = random.Random(checkpoint["seed"])
+        rng_state = checkpoint["rng_state"]
+        if rng_state is not None:
+            rng_state = (rng_state[0], tuple(rng_state[1]), rng_state[2])
+        timings_file, writer = open_timings_file(run_dir)
+        # Kept with the checkpoint for the summaries, the column names do not say
+        checkpoint["operation"] = operation
+        checkpoint["data_type"] = data_type
+        checkpoint["tuning_profile"] = options.get("tuning_profile", "default")
+
+        def record_rep(rep, seconds, parts, cache_state):
+            # Flush every rep so a crash loses at most the rep being measured
+            writer.writerow(
+                (
+                    column,
+                    operation,
+                    data_type,
+                    options_text,
+                    checkpoint["tuning_profile"],
+                    cache_state,
+                    rep,
+                    repr(seconds),
+                    *(repr(parts[part]) for part in rep_parts),
+                    repr(time.time()),
+                )
+            )
+            timings_file.flush()
+            checkpoint["times"].append(seconds)
+            for part in rep_parts:
+                checkpoint[f"{part}_times"].append(parts[part])
+            if checkpoint_reps:
+                checkpoint["rep"] = rep
+                checkpoint["rng_state"] = rng.getstate()
+                if record_statement_latencies:
+                    checkpoint["latency"] = latency_histogram_state()
+                write_json_file(checkpoint_path(run_dir, column), checkpoint)
+
+        def record_commit(seconds):
+            checkpoint["cell_commit"] = seconds
+
+        def record_reset(seconds):
+            checkpoint["cell_reset"] = seconds
+
+        def record_plan(plan):
+            # Kept next to the cell's times so plan choice can be read alongside them
+            checkpoint["plan"] = plan
+
+        def record_latency(state):
+            checkpoint["latency"] = state
+            checkpoint["latency_percentiles"] = latency_percentiles(state)
+
+        def record_server(server):
+            checkpoint["server"] = server
+
+        def record_explain(rep, explain):
+            # Full plans go to their own file, the checkpoint keeps running sums
+            explains_file.write(
+                json.dumps({"column": column, "rep": rep, **explain}) + "\n"
+            )
+            explains_file.flush()
+            totals = checkpoint.setdefault(
+                "explain", dict.fromkeys(("statements",) + explain_fields, 0)
+            )
+            totals["statements"] += 1
+            for key in explain_fields:
+                totals[key] += explain[key]
 
+        def record_adaptive(adaptive):
+            checkpoint["adaptive"] = adaptive
 
-def delete_geometry_query(reps, num_rows, faker_entries):
+        def record_profile(profile, profiler):
+            checkpoint["profile"] = profile
+            if profiler is not None:
+                os.makedirs(os.path.join(run_dir, "profiles"), exist_ok=True)
+                profiler.dump_stats(os.path.join(run_dir, "profiles", f"{column}.prof"))
+
+        explains_file = open(
+            os.path.join(run_dir, f"explains_{os.getpid()}.jsonl"), "a"
+        )
+        with timings_file, explains_file:
+            if checkpoint["rep"] + 1 < reps:
+                run_workload(
+                    operation,
+                    data_type,
+                    reps,
+                    num_rows,
+                    faker_entries,
+                    on_rep=record_rep,
+                    on_commit=record_commit,
+                    on_reset=record_reset,
+                    on_plan=record_plan,
+                    on_latency=record_latency,
+                    statement_latencies=record_statement_latencies,
+                    latency_state=checkpoint.get("latency"),
+                    server_stats=capture_server_stats,
+                    explain_fraction=explain_analyze_fraction,
+                    on_server=record_server,
+                    on_explain=record_explain,
+                    on_profile=record_profile,
+                    ci_width=adaptive_ci_width,
+                    ci_percentile=adaptive_percentile,
+                    min_reps=adaptive_min_reps,
+                    prior_times=list(checkpoint["times"]),
+                    on_adaptive=record_adaptive,
+                    rng=rng,
+                    first_rep=checkpoint["rep"] + 1,
+                    rng_state=rng_state,
+                    **options,
+                )
+        checkpoint["finished"] = True
+        write_json_file(checkpoint_path(run_dir, column), checkpoint)
+        times = checkpoint["times"]
+    # Close the transaction the planning EXPLAIN leaves open, releasing its locks
+    db_connection.rollback()
+    return column, times
+
+
+def init_shard_worker(shard_ids):
+    # Give this worker process a scratch copy of the employees table in its own schema
+    schema = f"shard_{shard_ids.get()}"
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    cursor.execute(
+        f"CREATE TABLE {schema}.employees (LIKE public.employees INCLUDING ALL)"
+    )
+    cursor.execute(f"SET search_path TO {schema}, public")
+    db_connection.commit()
+    # Pooled and async connections opened later resolve employees to the same table
+    db_params["options"] = f"-c search_path={schema},public"
+
+
+def run_workload_matrix(
+    cells, reps, num_rows, faker_entries, processes=1, run_dir=None
+):
     """
-    reps {int}: number of repetitions of simulating the insertion
-    num_rows {int}: number of rows to add to the employees table
+    cells {list}: (output column, operation, data type, options) of every cell to time
+    reps {int}: number of repetitions of every cell
+    num_rows {int}: number of rows every rep works on
     faker_entries {int}: number of fake entries to sample from without replacement
+    processes {int}: worker processes to shard the cells over, 1 runs them in order here
+    run_dir {str}: directory from start_results_run every rep is streamed to, if any
     """
-    geometry_query_delete_times = []
-    employee_data = create_faker_data(faker_entries)
-    insert_query_full = """
-            INSERT INTO employees 
-            (employee_id, first_name, last_name, age, rating,
-            json_contact_info, bjson_contact_info, address)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-    for row in employee_data:
-        cursor.execute(insert_query_full, row)
-    for i in range(0, reps):
-        delete_query_geometry = """
-        DELETE FROM employees
-        WHERE employee_id = %s AND address::geometry = %s
-        """
-        sampled_data = random.sample(employee_data, num_rows)
+    if processes <= 1:
+        results = [
+            run_workload_cell(
+                column,
+                operation,
+                data_type,
+                reps,
+                num_rows,
+                faker_entries,
+                options,
+                run_dir,
+            )
+            for column, operation, data_type, options in cells
+        ]
+        release_kept_fixture()
+        return dict(results)
+    # Spawned workers import this module afresh and so open their own connections
+    context = multiprocessing.get_context("spawn")
+    shard_ids = context.Queue()
+    for shard_id in range(0, processes):
+        shard_ids.put(shard_id)
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=context,
+        initializer=init_shard_worker,
+        initargs=(shard_ids,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                run_workload_cell,
+                column,
+                operation,
+                data_type,
+                reps,
+                num_rows,
+                faker_entries,
+                options,
+                run_dir,
+            )
+            for column, operation, data_type, options in cells
+        ]
+        try:
+            results = dict(future.result() for future in futures)
+        finally:
+            # Shut the workers down first so their connections release the shards
+            executor.shutdown(wait=True, cancel_futures=True)
+            for shard_id in range(0, processes):
+                cursor.execute(f"DROP SCHEMA IF EXISTS shard_{shard_id} CASCADE")
+            db_connection.commit()
+    return results
+
+
+if __name__ == "__main__":
+    # Every workload once in its default mode, in the column order of earlier runs
+    workload_cells = [
+        (f"{data_type}_query_{operation}", operation, data_type, {})
+        for data_type in data_type_specs
+        for operation in operation_specs
+    ]
+
+    # The bulk insert strategies on every create workload; "row" is covered above
+    for insert_strategy in insert_strategies[1:]:
+        for data_type in data_type_specs:
+            workload_cells.append(
+                (
+                    f"{data_type}_query_create_{insert_strategy}",
+                    "create",
+                    data_type,
+                    {"insert_strategy": insert_strategy},
+                )
+            )
+
+    # The set-based read mode on every read workload; "row" is covered above
+    for read_mode in read_modes[1:]:
+        for data_type in data_type_specs:
+            workload_cells.append(
+                (
+                    f"{data_type}_query_read_{read_mode}",
+                    "read",
+                    data_type,
+                    {"read_mode": read_mode},
+                )
+            )
+
+    # Row mode reads that also pull their results back, to time the decoding
+    for fetch_mode in fetch_modes[1:]:
+        for data_type in data_type_specs:
+            workload_cells.append(
+                (
+                    f"{data_type}_query_read_{fetch_mode}",
+                    "read",
+                    data_type,
+                    {"fetch_mode": fetch_mode},
+                )
+            )
+
+    # Every workload on top of each set of secondary indexes
+    for index_profile in index_profiles:
+        if index_profile == "none":
+            continue
+        for operation in operation_specs:
+            for data_type in data_type_specs:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_{index_profile}",
+                        operation,
+                        data_type,
+                        {"index_profile": index_profile},
+                    )
+                )
+
+    # Index-friendly predicates on the columns they apply to, without and with indexes
+    for predicate, templates in predicate_variants.items():
+        for index_profile in ("none", "all"):
+            variant = f"{predicate}_{index_profile}"
+            for operation in ("read", "update", "delete"):
+                for data_type, data_type_spec in data_type_specs.items():
+                    if not set(templates) & set(data_type_spec["columns"]):
+                        continue
+                    workload_cells.append(
+                        (
+                            f"{data_type}_query_{operation}_{variant}",
+                            operation,
+                            data_type,
+                            {"index_profile": index_profile, "predicate": predicate},
+                        )
+                    )
+
+    # Lookups by employee_id alone and by the typed columns alone
+    for predicate_mode in predicate_modes:
+        if predicate_mode == "pk_typed":
+            continue
+        for operation in ("read", "update", "delete"):
+            for data_type in data_type_specs:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_{predicate_mode}",
+                        operation,
+                        data_type,
+                        {"predicate_mode": predicate_mode},
+                    )
+                )
+
+    # Every workload again through server-side prepared statements
+    for operation in operation_specs:
+        for data_type in data_type_specs:
+            workload_cells.append(
+                (
+                    f"{data_type}_query_{operation}_prepared",
+                    operation,
+                    data_type,
+                    {"prepared": True},
+                )
+            )
+
+    # Every workload with its sampled rows split across client threads
+    worker_counts = (2, 4, 8)
+    for workers in worker_counts:
+        for operation in operation_specs:
+            for data_type in data_type_specs:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_workers{workers}",
+                        operation,
+                        data_type,
+                        {"workers": workers},
+                    )
+                )
+
+    # Every workload on the asyncio backend with more statements in flight
+    async_worker_counts = (1, 16)
+    for workers in async_worker_counts:
+        for operation in operation_specs:
+            for data_type in data_type_specs:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_asyncio{workers}",
+                        operation,
+                        data_type,
+                        {"workers": workers, "backend": "asyncio"},
+                    )
+                )
+
+    # The write workloads again with commits inside their timed reps
+    for transaction_mode in matrix_transaction_modes:
+        if transaction_mode == "autocommit":
+            variant = transaction_mode
+        else:
+            variant = f"commit_{transaction_mode}"
+        for operation in ("create", "update"):
+            for data_type in data_type_specs:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_{variant}",
+                        operation,
+                        data_type,
+                        {"transaction_mode": transaction_mode},
+                    )
+                )
+
+    # The create workloads again with every other way of emptying the table between reps
+    for reset_strategy in reset_strategies:
+        if reset_strategy == "truncate":
+            continue
+        for data_type in data_type_specs:
+            workload_cells.append(
+                (
+                    f"{data_type}_query_create_reset_{reset_strategy}",
+                    "create",
+                    data_type,
+                    {"reset_strategy": reset_strategy},
+                )
+            )
+
+    # Every workload a tuning profile is meant for; the write workloads commit every
+    # rep so profiles changing the cost of a commit show, next to the _commit_rep cells
+    for tuning_profile, tuning_spec in tuning_profiles.items():
+        if tuning_profile == "default":
+            continue
+        for operation in tuning_spec["operations"]:
+            for data_type in data_type_specs:
+                options = {"tuning_profile": tuning_profile}
+                variant = tuning_profile
+                if operation in ("create", "update"):
+                    options["transaction_mode"] = "rep"
+                    variant = f"commit_rep_{tuning_profile}"
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_{variant}",
+                        operation,
+                        data_type,
+                        options,
+                    )
+                )
+
+    # Every workload warmed up with its table prewarmed, then with cold caches
+    for operation in operation_specs:
+        for data_type in data_type_specs:
+            workload_cells.append(
+                (
+                    f"{data_type}_query_{operation}_warm",
+                    operation,
+                    data_type,
+                    {"cache_mode": "warm", "prewarm": True},
+                )
+            )
+            for cold_method in matrix_cold_methods:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_cold_{cold_method}",
+                        operation,
+                        data_type,
+                        {"cache_mode": "cold", "cold_method": cold_method},
+                    )
+                )
+
+    # Every workload through the profiling cursor, then under the Python profilers
+    if profile_client_cells:
+        for operation in operation_specs:
+            for data_type in data_type_specs:
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_profiled",
+                        operation,
+                        data_type,
+                        {"client_profile": True},
+                    )
+                )
+                workload_cells.append(
+                    (
+                        f"{data_type}_query_{operation}_cprofiled",
+                        operation,
+                        data_type,
+                        {"cprofile": True, "trace_memory": True},
+                    )
+                )
+
+    tic = time.perf_counter()
+    if resume_run_dir is None:
+        run_dir = start_results_run(
+            workload_cells, 500, 500, 5000, processes=matrix_processes
+        )
+    else:
+        run_dir = resume_results_run(resume_run_dir, workload_cells, 500, 500, 5000)
+    run_workload_matrix(
+        workload_cells, 500, 500, 5000, processes=matrix_processes, run_dir=run_dir
+    )
+    finish_results_run(run_dir)
+    toc = time.perf_counter()
+
+    print(f"This whole thing took {toc-tic} seconds to run")
+    print(f"Timings were streamed to {run_dir}")
+
+    # Spreadsheet of the streamed timings for Statistical_Tests.R
+    if export_excel:
+        export_results_excel(run_dir, "Python_output_final500.xlsx")
+
+    # Every read, update and delete workload again at each table size and rows per rep
+    if run_scaling_sweep:
+        sweep_cells = []
+        # One table size after the other, so each padded table is built only once
+        for table_rows in sweep_table_rows:
+            for operation in ("read", "update", "delete"):
+                for data_type in data_type_specs:
+                    for predicate_mode in sweep_predicate_modes:
+                        variant = (
+                            "" if predicate_mode == "pk_typed" else f"_{predicate_mode}"
+                        )
+                        for num_rows in sweep_num_rows:
+                            sweep_cells.append(
+                                (
+                                    f"{data_type}_query_{operation}{variant}"
+                                    f"_table{table_rows}_batch{num_rows}",
+                                    operation,
+                                    data_type,
+                                    {
+                                        "table_rows": table_rows,
+                                        "num_rows": num_rows,
+                                        "faker_entries": min(
+                                            table_rows, sweep_faker_entries
+                                        ),
+                                        "predicate_mode": predicate_mode,
+                                    },
+                                )
+                            )
+
         tic = time.perf_counter()
-        for j in range(0, len(sampled_data)):
-            cursor.execute(
-                delete_query_geometry, (sampled_data[j][0], sampled_data[j][7])
+        # Rows per rep and dataset size are recorded per cell, in their options
+        if resume_sweep_dir is None:
+            sweep_dir = start_results_run(
+                sweep_cells, sweep_reps, None, None, processes=matrix_processes
+            )
+        else:
+            sweep_dir = resume_results_run(
+                resume_sweep_dir, sweep_cells, sweep_reps, None, None
             )
-            db_connection.rollback()
+        run_workload_matrix(
+            sweep_cells,
+            sweep_reps,
+            None,
+            None,
+            processes=matrix_processes,
+            run_dir=sweep_dir,
+        )
+        finish_results_run(sweep_dir)
         toc = time.perf_counter()
-        geometry_query_delete_times.append(toc - tic)
-    cursor.execute("TRUNCATE TABLE employees")
-    print(f"""Average geometry query delete time of {num_rows}
-        rows of random data from {faker_entries} employee entries
-        took {sum(geometry_query_delete_times)/reps} seconds for a total of
-        {sum(geometry_query_delete_times)} seconds using Python and psycopg2
-        """)
-    return geometry_query_delete_times
-
-
-tic = time.perf_counter()
-full_query_create_times = create_full_query(500, 500, 5000)
-full_query_read_times = read_full_query(500, 500, 5000)
-full_query_update_times = update_full_query(500, 500, 5000)
-full_query_delete_times = delete_full_query(500, 500, 5000)
-text_query_create_times = create_text_query(500, 500, 5000)
-text_query_read_times = read_text_query(500, 500, 5000)
-text_query_update_times = update_text_query(500, 500, 5000)
-text_query_delete_times = delete_text_query(500, 500, 5000)
-integer_query_create_times = create_int_query(500, 500, 5000)
-integer_query_read_times = read_integer_query(500, 500, 5000)
-integer_query_update_times = update_integer_query(500, 500, 5000)
-integer_query_delete_times = delete_integer_query(500, 500, 5000)
-float_query_create_times = create_float_query(500, 500, 5000)
-float_query_read_times = read_float_query(500, 500, 5000)
-float_query_update_times = update_float_query(500, 500, 5000)
-float_query_delete_times = delete_float_query(500, 500, 5000)
-json_query_create_times = create_json_query(500, 500, 5000)
-json_query_read_times = read_json_query(500, 500, 5000)
-json_query_update_times = update_json_query(500, 500, 5000)
-json_query_delete_times = delete_json_query(500, 500, 5000)
-bjson_query_create_times = create_bjson_query(500, 500, 5000)
-bjson_query_read_times = read_bjson_query(500, 500, 5000)
-bjson_query_update_times = update_bjson_query(500, 500, 5000)
-bjson_query_delete_times = delete_bjson_query(500, 500, 5000)
-geometry_query_create_times = create_geometry_query(500, 500, 5000)
-geometry_query_read_times = read_geometry_query(500, 500, 5000)
-geometry_query_update_times = update_geometry_query(500, 500, 5000)
-geometry_query_delete_times = delete_geometry_query(500, 500, 5000)
-toc = time.perf_counter()
-
-print(f"This whole thing took {toc-tic} seconds to run")
-
-# Add time results to a dataframe and output to excel file
-df = pd.DataFrame(
-    {
-        "full_query_create": full_query_create_times,
-        "full_query_read": full_query_read_times,
-        "full_query_update": full_query_update_times,
-        "full_query_delete": full_query_delete_times,
-        "text_query_create": text_query_create_times,
-        "text_query_read": text_query_read_times,
-        "text_query_update": text_query_update_times,
-        "text_query_delete": text_query_delete_times,
-        "integer_query_create": integer_query_create_times,
-        "integer_query_read": integer_query_read_times,
-        "integer_query_update": integer_query_update_times,
-        "integer_query_delete": integer_query_delete_times,
-        "float_query_create": float_query_create_times,
-        "float_query_read": float_query_read_times,
-        "float_query_update": float_query_update_times,
-        "float_query_delete": float_query_delete_times,
-        "json_query_create": json_query_create_times,
-        "json_query_read": json_query_read_times,
-        "json_query_update": json_query_update_times,
-        "json_query_delete": json_query_delete_times,
-        "bjson_query_create": bjson_query_create_times,
-        "bjson_query_read": bjson_query_read_times,
-        "bjson_query_update": bjson_query_update_times,
-        "bjson_query_delete": bjson_query_delete_times,
-        "geometry_query_create": geometry_query_create_times,
-        "geometry_query_read": geometry_query_read_times,
-        "geometry_query_update": geometry_query_update_times,
-        "geometry_query_delete": geometry_query_delete_times,
-    }
-)
-df.to_excel("Python_output_final500.xlsx")
+
+        print(f"The scaling sweep took {toc-tic} seconds to run")
+        print(f"Timings were streamed to {sweep_dir}")
+        export_scaling_excel(sweep_dir, os.path.join(sweep_dir, "scaling.xlsx"))
@@ -0,0 +1,414 @@
+import numpy as np
+import pandas as pd
+import glob
+import json
+import math
+import os
+import time
+
+# Run directory of main.py to analyse, None picks the latest one under results_dir
+results_dir = "results"
+analysis_run_dir = None
+
+# Spreadsheets in the layout Statistical_Tests.R reads, such as the
+# Python_output_final200.xlsx of earlier runs, to analyse next to the run
+analysis_wide_files = ()
+
+# Relative width of log-spaced bins to round raw samples into, so millions of samples
+# reduce to a few thousand distinct values weighted by how often they occur; None
+# keeps them exact, as rep times always can be at a few hundred per cell
+sample_precision = None
+
+# Resamples of every bootstrap confidence interval and the confidence they are at
+bootstrap_reps = 2000
+confidence_level = 0.95
+bootstrap_seed = 460
+
+# Largest number of resampled counts held in memory at once while bootstrapping
+bootstrap_chunk_cells = 5_000_000
+
+# Buckets per power of two of the latency histograms main.py saves in its checkpoints
+latency_sub_buckets = 64
+
+
+def weighted_samples(samples, precision=sample_precision):
+    # Distinct values of raw samples and how often each occurs, after rounding the
+    # positive ones to the centre of their log-spaced bin
+    samples = np.asarray(samples, dtype=np.float64)
+    samples = samples[np.isfinite(samples)]
+    if precision:
+        step = np.log1p(precision)
+        positive = samples > 0
+        logs = np.log(np.where(positive, samples, 1.0))
+        samples = np.where(positive, np.exp(np.round(logs / step) * step), samples)
+    return np.unique(samples, return_counts=True)
+
+
+def histogram_samples(state):
+    # Weighted samples in seconds of a latency histogram saved by main.py, every
+    # bucket standing for the highest latency it holds as main.latency_bucket_value
+    indices = np.array([int(index) for index in state["counts"]], dtype=np.int64)
+    counts = np.array(list(state["counts"].values()), dtype=np.int64)
+    order = np.argsort(indices)
+    indices, counts = indices[order], counts[order]
+    shifts = np.maximum(indices // latency_sub_buckets - 1, 0)
+    values_ns = np.where(
+        indices < 2 * latency_sub_buckets,
+        indices,
+        ((indices - latency_sub_buckets * shifts + 1) << shifts) - 1,
+    )
+    return np.minimum(values_ns, state["max_ns"]) / 1e9, counts
+
+
+def sample_bounds(values, precision=sample_precision):
+    # Lowest and highest raw sample every weighted value stands for, itself unless
+    # the samples were rounded into log-spaced bins
+    if not precision:
+        return values, values
+    half_step = np.log1p(precision) / 2
+    return values * np.exp(-half_step), values * np.exp(half_step)
+
+
+def histogram_bounds(values):
+    # Lowest and highest latency of the histogram bucket every value stands for
+    values_ns = np.round(values * 1e9).astype(np.int64)
+    shifts = np.maximum(np.frexp(values_ns.astype(np.float64))[1] - 7, 0)
+    return ((values_ns >> shifts) << shifts) / 1e9, values
+
+
+def weighted_quantile(values, counts, q):
+    # Smallest value at or above a fraction q of the samples, R's quantile type 1
+    cumulative = np.cumsum(counts)
+    rank = max(math.ceil(q * cumulative[-1]), 1)
+    return values[np.searchsorted(cumulative, rank)]
+
+
+def bootstrap_median_ci(
+    values,
+    counts,
+    reps=bootstrap_reps,
+    confidence=confidence_level,
+    rng=None,
+    bounds=None,
+):
+    """
+    values {np.ndarray}: sorted distinct sample values
+    counts {np.ndarray}: number of samples at each value
+    reps {int}: number of bootstrap resamples
+    confidence {float}: coverage of the percentile interval
+    rng {np.random.Generator}: source of the resamples, seeded from bootstrap_seed
+    bounds {tuple}: lowest and highest sample every value stands for when the
+        samples are binned, from sample_bounds or histogram_bounds
+    """
+    if rng is None:
+        rng = np.random.default_rng(bootstrap_seed)
+    total = int(counts.sum())
+    rank = (total + 1) // 2
+    # A resample of weighted samples is a multinomial draw of counts over the values
+    chunk = max(bootstrap_chunk_cells // len(values), 1)
+    medians = []
+    for start in range(0, reps, chunk):
+        draws = rng.multinomial(total, counts / total, size=min(chunk, reps - start))
+        medians.append(values[np.argmax(np.cumsum(draws, axis=1) >= rank, axis=1)])
+    medians = np.concatenate(medians)
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(medians, [tail, 1 - tail], method="inverted_cdf")
+    # Widened to the edges of the bins its ends fall in, so an interval over binned
+    # samples is never narrower than the bin the median lies in
+    lows, highs = (values, values) if bounds is None else bounds
+    return lows[np.searchsorted(values, low)], highs[np.searchsorted(values, high)]
+
+
+def pooled_ranks(groups):
+    # Every group's counts on the values of all groups pooled, the midrank of each
+    # of those values, and the tie term sum(t^3 - t) of the pooled counts
+    support = np.unique(np.concatenate([values for values, counts in groups]))
+    table = np.zeros((len(groups), len(support)))
+    for row, (values, counts) in enumerate(groups):
+        table[row, np.searchsorted(support, values)] = counts
+    totals = table.sum(axis=0)
+    midranks = np.cumsum(totals) - (totals - 1) / 2
+    return table, midranks, float(np.sum(totals**3 - totals))
+
+
+def normal_two_sided(z):
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def chi2_sf(x, df):
+    # Upper tail of the chi-squared distribution for whole degrees of freedom, from
+    # its closed-form series
+    if x <= 0:
+        return 1.0
+    half = x / 2
+    if df % 2 == 0:
+        term = math.exp(-half)
+        total = term
+        for k in range(1, df // 2):
+            term *= half / k
+            total += term
+        return min(total, 1.0)
+    total = math.erfc(math.sqrt(half))
+    term = math.sqrt(2 * x / math.pi) * math.exp(-half)
+    for k in range(1, (df + 1) // 2):
+        total += term
+        term *= x / (2 * k + 1)
+    return min(total, 1.0)
+
+
+def holm_adjust(p_values):
+    # Holm's step-down adjustment of a family of p-values
+    p_values = np.asarray(p_values, dtype=np.float64)
+    order = np.argsort(p_values)
+    steps = (len(p_values) - np.arange(len(p_values))) * p_values[order]
+    adjusted = np.empty_like(p_values)
+    adjusted[order] = np.minimum(np.maximum.accumulate(steps), 1.0)
+    return adjusted
+
+
+def mann_whitney(first, second):
+    """
+    first {tuple}: values and counts of the first sample
+    second {tuple}: values and counts of the second sample
+    """
+    # Normal approximation with tie and continuity corrections, as R's wilcox.test
+    table, midranks, ties = pooled_ranks([first, second])
+    n1, n2 = table.sum(axis=1)
+    total = n1 + n2
+    u = table[0] @ midranks - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((total + 1) - ties / (total * (total - 1))))
+    z = (u - mean - 0.5 * np.sign(u - mean)) / sigma if sigma > 0 else 0.0
+    return {
+        "U": u,
+        "z": z,
+        "p_value": normal_two_sided(z),
+        # Probability a sample of the first is larger, counting ties as one half
+        "effect": u / (n1 * n2),
+    }
+
+
+def kruskal_wallis(groups):
+    # H statistic with the tie correction and its chi-squared p-value
+    table, midranks, ties = pooled_ranks(groups)
+    sizes = table.sum(axis=1)
+    total = sizes.sum()
+    rank_sums = table @ midranks
+    h = 12 / (total * (total + 1)) * np.sum(rank_sums**2 / sizes) - 3 * (total + 1)
+    h /= 1 - ties / (total**3 - total)
+    return {"H": h, "df": len(groups) - 1, "p_value": chi2_sf(h, len(groups) - 1)}
+
+
+def dunn(groups, labels):
+    # Pairwise mean rank differences after Kruskal-Wallis, Holm adjusted as the
+    # dunnTest calls of Statistical_Tests.R
+    table, midranks, ties = pooled_ranks(groups)
+    sizes = table.sum(axis=1)
+    total = sizes.sum()
+    mean_ranks = table @ midranks / sizes
+    spread = total * (total + 1) / 12 - ties / (12 * (total - 1))
+    first, second = np.triu_indices(len(groups), k=1)
+    z = (mean_ranks[first] - mean_ranks[second]) / np.sqrt(
+        spread * (1 / sizes[first] + 1 / sizes[second])
+    )
+    p_values = np.array([normal_two_sided(value) for value in z])
+    return pd.DataFrame(
+        {
+            "comparison": [f"{labels[i]} - {labels[j]}" for i, j in zip(first, second)],
+            "z": z,
+            "p_unadjusted": p_values,
+            "p_adjusted": holm_adjust(p_values),
+        }
+    )
+
+
+def split_column(column):
+    # Data type, operation and strategy of an output column of main.py
+    data_type, rest = column.split("_query_", 1)
+    operation, _, strategy = rest.partition("_")
+    return data_type, operation, strategy or "default"
+
+
+def latest_run_dir():
+    runs = sorted(glob.glob(os.path.join(results_dir, "run_*")))
+    return runs[-1] if runs else None
+
+
+def load_rep_samples(run_dir):
+    # Weighted rep times of every cell of a run, the rep redone after an interruption
+    # replacing the one recorded before it as in main.load_timings
+    timings = pd.concat(
+        [
+            pd.read_csv(path)
+            for path in glob.glob(os.path.join(run_dir, "timings_*.csv"))
+        ],
+        ignore_index=True,
+    )
+    timings = timings.sort_values("recorded_at").drop_duplicates(
+        ["column", "rep"], keep="last"
+    )
+    return {
+        column: weighted_samples(group["seconds"].to_numpy())
+        for column, group in timings.groupby("column", sort=False)
+    }
+
+
+def load_statement_samples(run_dir):
+    # Weighted statement latencies of every cell that kept a latency histogram
+    samples = {}
+    for path in sorted(glob.glob(os.path.join(run_dir, "checkpoints", "*.json"))):
+        with open(path) as json_file:
+            latency = json.load(json_file).get("latency")
+        if latency is not None and latency["counts"]:
+            column = os.path.basename(path)[: -len(".json")]
+            samples[column] = histogram_samples(latency)
+    return samples
+
+
+def load_wide_samples(path):
+    # Weighted samples of a spreadsheet in the layout Statistical_Tests.R reads, one
+    # column per cell after the index column
+    df = pd.read_excel(path)
+    return {
+        column: weighted_samples(df[column].dropna().to_numpy())
+        for column in df.columns[1:]
+    }
+
+
+def summarise_samples(samples, bounds=sample_bounds):
+    # Median with its bootstrap confidence interval for every cell
+    rows = []
+    rng = np.random.default_rng(bootstrap_seed)
+    for column, (values, counts) in samples.items():
+        data_type, operation, strategy = split_column(column)
+        ci_low, ci_high = bootstrap_median_ci(
+            values, counts, rng=rng, bounds=bounds(values)
+        )
+        rows.append(
+            {
+                "column": column,
+                "data_type": data_type,
+                "operation": operation,
+                "strategy": strategy,
+                "samples": int(counts.sum()),
+                "median": weighted_quantile(values, counts, 0.5),
+                "median_ci_low": ci_low,
+                "median_ci_high": ci_high,
+                "mean": float(values @ counts / counts.sum()),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def compare_strategies(samples):
+    # Every strategy of an operation and data type against its default cell
+    rows = []
+    for column, (values, counts) in samples.items():
+        data_type, operation, strategy = split_column(column)
+        baseline = f"{data_type}_query_{operation}"
+        if strategy == "default" or baseline not in samples:
+            continue
+        rows.append(
+            {
+                "column": column,
+                "baseline": baseline,
+                "data_type": data_type,
+                "operation": operation,
+                "strategy": strategy,
+                "median_ratio": weighted_quantile(values, counts, 0.5)
+                / weighted_quantile(*samples[baseline], 0.5),
+                **mann_whitney((values, counts), samples[baseline]),
+            }
+        )
+    comparisons = pd.DataFrame(rows)
+    if len(comparisons):
+        comparisons["p_adjusted"] = holm_adjust(comparisons["p_value"])
+    return comparisons
+
+
+def compare_factor(samples, factor):
+    """
+    samples {dict}: weighted samples of every cell, keyed by output column
+    factor {str}: "data_type" or "operation", compared within every combination of
+        the other two of data type, operation and strategy
+    """
+    keys = ("data_type", "operation", "strategy")
+    within = [key for key in keys if key != factor]
+    families = {}
+    for column in samples:
+        parts = dict(zip(keys, split_column(column)))
+        family = tuple(parts[key] for key in within)
+        families.setdefault(family, []).append((parts[factor], column))
+    tests = []
+    pairs = []
+    for family, members in families.items():
+        if len(members) < 2:
+            continue
+        labels = [label for label, column in members]
+        groups = [samples[column] for label, column in members]
+        tests.append({**dict(zip(within, family)), **kruskal_wallis(groups)})
+        pairwise = dunn(groups, labels)
+        for key, value in zip(within, family):
+            pairwise.insert(0, key, value)
+        pairs.append(pairwise)
+    return pd.DataFrame(tests), pd.concat(pairs, ignore_index=True) if pairs else None
+
+
+def analyse_samples(samples, bounds=sample_bounds):
+    # Every table of the analysis, keyed by the sheet it is written to
+    tables = {
+        "summary": summarise_samples(samples, bounds),
+        "strategies": compare_strategies(samples),
+    }
+    for factor in ("data_type", "operation"):
+        tests, pairs = compare_factor(samples, factor)
+        tables[f"kruskal_{factor}"] = tests
+        if pairs is not None:
+            tables[f"dunn_{factor}"] = pairs
+    return tables
+
+
+def write_tables(tables, path):
+    with pd.ExcelWriter(path) as writer:
+        for sheet_name, table in tables.items():
+            table.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+if __name__ == "__main__":
+    run_dir = latest_run_dir() if analysis_run_dir is None else analysis_run_dir
+    analyses = []
+    if run_dir is not None:
+        analyses.append(
+            (
+                os.path.join(run_dir, "statistics_reps.xlsx"),
+                lambda: load_rep_samples(run_dir),
+                sample_bounds,
+            )
+        )
+        analyses.append(
+            (
+                os.path.join(run_dir, "statistics_statements.xlsx"),
+                lambda: load_statement_samples(run_dir),
+                histogram_bounds,
+            )
+        )
+    for wide_file in analysis_wide_files:
+        analyses.append(
+            (
+                f"{os.path.splitext(wide_file)[0]}_statistics.xlsx",
+                lambda wide_file=wide_file: load_wide_samples(wide_file),
+                sample_bounds,
+            )
+        )
+    for path, load_samples, bounds in analyses:
+        tic = time.perf_counter()
+        samples = load_samples()
+        if not samples:
+            continue
+        write_tables(analyse_samples(samples, bounds), path)
+        toc = time.perf_counter()
+        print(
+            f"""Analysed {sum(int(counts.sum()) for values, counts in samples.values())}
+        samples of {len(samples)} cells in {toc - tic} seconds into {path}
+        """
+        )